@@ -1,5 +1,4 @@
 import string
-import scrapy
 
 from tpdb.BaseScraper import BaseScraper
 from tpdb.items import MovieItem
@@ -11,6 +10,7 @@ class BaseMovieScraper(BaseScraper):
             'tpdb.pipelines.TpdbApiMoviePipeline': 400,
         },
         'DOWNLOADER_MIDDLEWARES': {
+            'tpdb.middlewares.TpdbRequestClassifierMiddleware': 50,
             'tpdb.custommiddlewares.CustomProxyMiddleware': 350,
             'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 400,
             'tpdb.helpers.scrapy_dpath.DPathMiddleware': 542,
@@ -19,22 +19,7 @@ class BaseMovieScraper(BaseScraper):
     }
 
     def parse(self, response, **kwargs):
-        movies = self.get_movies(response)
-        count = 0
-        for movie in movies:
-            count += 1
-            yield movie
-
-        if count:
-            if 'page' in response.meta and response.meta['page'] < self.limit_pages:
-                meta = response.meta
-                meta['page'] = meta['page'] + 1
-                print('NEXT PAGE: ' + str(meta['page']))
-                yield scrapy.Request(url=self.get_next_page_url(response.url, meta['page']),
-                                     callback=self.parse,
-                                     meta=meta,
-                                     headers=self.headers,
-                                     cookies=self.cookies)
+        yield from self.paginate(response, self.get_movies(response))
 
     def get_movies(self, response):
         return []
@@ -79,9 +64,6 @@ class BaseMovieScraper(BaseScraper):
         if 'front' not in item or not item['front']:
             item['front'] = None
 
-        if item['front']:
-            item['front_blob'] = self.get_image_blob_from_link(item['front'])
-
         if 'back' in response.meta:
             item['back'] = response.meta['back']
         else:
@@ -90,9 +72,6 @@ class BaseMovieScraper(BaseScraper):
         if 'back' not in item or not item['back']:
             item['back'] = None
 
-        if item['back']:
-            item['back_blob'] = self.get_image_blob_from_link(item['back'])
-
         if 'front_blob' not in item:
             item['front_blob'] = None
 
@@ -161,7 +140,7 @@ class BaseMovieScraper(BaseScraper):
 
         item['url'] = self.get_url(response)
 
-        yield self.check_item(item, self.days)
+        yield from self.fetch_image_blobs(self.check_item(item, self.days), {'front_blob': 'front', 'back_blob': 'back'})
 
     def get_description(self, response):
         if 'description' in self.get_selector_map():
@@ -1,20 +1,33 @@
 from io import BytesIO
 from typing import Any
 
-import pytesseract
-
 from PIL import Image, ImageFilter, ImageOps
+from scrapy.utils.defer import maybe_deferred_to_future
 from unidecode import unidecode
 
+from tpdb.helpers.ocr import OCRService, read_images
+
 
 class BaseOCR:
+    # Set by BaseScraper.from_crawler, tesseract output is then cached and get_data_from_image_async batches images.
+    # get_data_from_image and OCR_WORKERS = 0 run _image_pre_processing on this instance. With OCR workers the async
+    # path runs it on an instance of the class made without __init__, so it can't rely on state set up there
+    ocr_service = None
+
     def get_data_from_image(self, image: bytes) -> Any:
-        image = self._get_image_from_bytes(image)
-        image = self._image_pre_processing(image)
-        text: str = pytesseract.image_to_string(image)
-        res = self._text_post_processing(text)
+        if self.ocr_service:
+            text = self.ocr_service.read(self, image)
+        else:
+            text = read_images(self, [image])[0]
+
+        return self._text_post_processing(text)
+
+    async def get_data_from_image_async(self, image: bytes) -> Any:
+        if not self.ocr_service:
+            self.ocr_service = OCRService()
 
-        return res
+        text = await maybe_deferred_to_future(self.ocr_service.read_async(self, image))
+        return self._text_post_processing(text)
 
     @staticmethod
     def _image_pre_processing(image: Image.Image) -> Image.Image:
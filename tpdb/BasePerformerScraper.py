@@ -1,5 +1,4 @@
 import string
-import scrapy
 
 from tpdb.BaseScraper import BaseScraper
 from tpdb.items import PerformerItem
@@ -11,6 +10,7 @@ class BasePerformerScraper(BaseScraper):
             'tpdb.pipelines.TpdbApiPerformerPipeline': 400,
         },
         'DOWNLOADER_MIDDLEWARES': {
+            'tpdb.middlewares.TpdbRequestClassifierMiddleware': 50,
             'tpdb.custommiddlewares.CustomProxyMiddleware': 350,
             'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 400,
             'tpdb.helpers.scrapy_dpath.DPathMiddleware': 542,
@@ -19,22 +19,7 @@ class BasePerformerScraper(BaseScraper):
     }
 
     def parse(self, response, **kwargs):
-        performers = self.get_performers(response)
-        count = 0
-        for performer in performers:
-            count += 1
-            yield performer
-
-        if count:
-            if 'page' in response.meta and response.meta['page'] < self.limit_pages:
-                meta = response.meta
-                meta['page'] = meta['page'] + 1
-                print('NEXT PAGE: ' + str(meta['page']))
-                yield scrapy.Request(url=self.get_next_page_url(response.url, meta['page']),
-                                     callback=self.parse,
-                                     meta=meta,
-                                     headers=self.headers,
-                                     cookies=self.cookies)
+        yield from self.paginate(response, self.get_performers(response))
 
     def get_performers(self, response):
         return []
@@ -57,12 +42,10 @@ class BasePerformerScraper(BaseScraper):
 
         if 'image_blob' in response.meta:
             item['image_blob'] = response.meta['image_blob']
-        else:
+        elif not self.settings.getbool('ASYNC_IMAGES', True):
+            # With ASYNC_IMAGES the blob is requested by fetch_image_blobs once the item is complete
             item['image_blob'] = self.get_image_blob(response)
 
-        if ('image_blob' not in item or not item['image_blob']) and item['image']:
-            item['image_blob'] = self.get_image_blob_from_link(item['image'])
-
         if 'image_blob' not in item:
             item['image_blob'] = None
 
@@ -155,7 +138,7 @@ class BasePerformerScraper(BaseScraper):
         else:
             item['network'] = self.get_network(response)
 
-        yield item
+        yield from self.fetch_image_blobs(item, {'image_blob': 'image'})
 
     def get_name(self, response):
         if 'name' in self.selector_map:
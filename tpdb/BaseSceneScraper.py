@@ -1,6 +1,5 @@
 import re
 import string
-import scrapy
 
 from tpdb.BaseScraper import BaseScraper
 from tpdb.items import SceneItem
@@ -12,6 +11,7 @@ class BaseSceneScraper(BaseScraper):
             'tpdb.pipelines.TpdbApiScenePipeline': 400,
         },
         'DOWNLOADER_MIDDLEWARES': {
+            'tpdb.middlewares.TpdbRequestClassifierMiddleware': 50,
             'tpdb.custommiddlewares.CustomProxyMiddleware': 350,
             'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 400,
             'tpdb.helpers.scrapy_dpath.DPathMiddleware': 542,
@@ -20,18 +20,7 @@ class BaseSceneScraper(BaseScraper):
     }
 
     def parse(self, response, **kwargs):
-        scenes = self.get_scenes(response)
-        count = 0
-        for scene in scenes:
-            count += 1
-            yield scene
-
-        if count:
-            if 'page' in response.meta and response.meta['page'] < self.limit_pages:
-                meta = response.meta
-                meta['page'] = meta['page'] + 1
-                print('NEXT PAGE: ' + str(meta['page']))
-                yield scrapy.Request(url=self.get_next_page_url(response.url, meta['page']), callback=self.parse, meta=meta, headers=self.headers, cookies=self.cookies)
+        yield from self.paginate(response, self.get_scenes(response))
 
     def get_scenes(self, response):
         return []
@@ -71,12 +60,10 @@ class BaseSceneScraper(BaseScraper):
 
         if 'image_blob' in response.meta:
             item['image_blob'] = response.meta['image_blob']
-        else:
+        elif not self.settings.getbool('ASYNC_IMAGES', True):
+            # With ASYNC_IMAGES the blob is requested by fetch_image_blobs once the item is complete
             item['image_blob'] = self.get_image_blob(response)
 
-        if ('image_blob' not in item or not item['image_blob']) and item['image']:
-            item['image_blob'] = self.get_image_blob_from_link(item['image'])
-
         if 'image_blob' not in item:
             item['image_blob'] = None
 
@@ -162,12 +149,10 @@ class BaseSceneScraper(BaseScraper):
         else:
             if 'back_blob' in response.meta:
                 item['back_blob'] = response.meta['back_blob']
-            else:
+            elif not self.settings.getbool('ASYNC_IMAGES', True):
+                # Same as image_blob, fetch_image_blobs requests it with ASYNC_IMAGES
                 item['back_blob'] = self.get_image_back_blob(response)
 
-            if ('back_blob' not in item or not item['back_blob']) and item['back']:
-                item['back_blob'] = self.get_image_from_link(item['back'])
-
         if 'back_blob' not in item:
             item['back_blob'] = None
 
@@ -185,7 +170,7 @@ class BaseSceneScraper(BaseScraper):
         else:
             item['type'] = 'Scene'
 
-        yield self.check_item(item, self.days)
+        yield from self.fetch_image_blobs(self.check_item(item, self.days), {'image_blob': 'image', 'back_blob': 'back'})
 
     def get_date(self, response):
         if 'date' in self.get_selector_map():
@@ -1,21 +1,26 @@
 import sys
 from datetime import date, timedelta
 import re
-from PIL import Image
-import base64
-from io import BytesIO
 import html
 import logging
 import string
 from abc import ABC
-from urllib.parse import urlparse, unquote
+from urllib.parse import urlparse
 
-import dateparser
 import scrapy
-import tldextract
 
-from furl import furl
+from tpdb.helpers.crawl_state import CrawlState
+from tpdb.helpers.dates import DateParser
+from tpdb.helpers.domains import get_domain
 from tpdb.helpers.http import Http
+from tpdb.helpers.image import ImagePool, transcode_image
+from tpdb.helpers.image_cache import ImageCache
+from tpdb.helpers.ocr import OCRService
+from tpdb.helpers.profiler import FieldProfiler
+from tpdb.helpers.selectors import compile_selector, compile_selector_map
+from tpdb.helpers.urls import normalize_url
+from scrapy import signals
+from scrapy.utils.defer import maybe_deferred_to_future
 from scrapy.utils.project import get_project_settings
 
 
@@ -34,6 +39,13 @@ class BaseScraper(scrapy.Spider, ABC):
     selector_map = {}
     regex = {}
     proxy_address = None
+    image_pool = None
+    image_cache = None
+    crawl_state = None
+    fanout = None
+    date_parser = None
+    date_languages = None
+    profiler = None
 
     title_trash = []
     description_trash = ['Description:']
@@ -47,12 +59,15 @@ class BaseScraper(scrapy.Spider, ABC):
                 regexp, group, mod = self.get_regex(self.get_selector_map(name))
                 self.regex[name] = (re.compile(regexp, mod), group)
 
+        compile_selector_map(self.get_selector_map(), ('external_id', 'pagination', 'date_formats', 'type'))
+
         self.days = int(self.days)
         if self.days < 9999:
             logging.info(f"Days to retrieve: {self.days}")
         self.force = bool(self.force)
         self.debug = bool(self.debug)
         self.page = int(self.page)
+        self.fanout_state = {}
 
         if self.limit_pages is None:
             self.limit_pages = 1
@@ -61,6 +76,37 @@ class BaseScraper(scrapy.Spider, ABC):
                 self.limit_pages = sys.maxsize
             self.limit_pages = int(self.limit_pages)
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(BaseScraper, cls).from_crawler(crawler, *args, **kwargs)
+        Http.configure(crawler.settings)
+        spider.image_pool = ImagePool.from_settings(crawler.settings)
+        spider.image_cache = ImageCache.from_crawler(crawler)
+        spider.crawl_state = CrawlState.from_crawler(crawler, spider.name)
+        spider.date_parser = DateParser.from_crawler(crawler, spider.date_languages)
+        spider.profiler = FieldProfiler.from_crawler(crawler, spider)
+        # Only spiders mixing in BaseOCR have the attribute
+        if hasattr(spider, 'ocr_service'):
+            spider.ocr_service = OCRService.from_crawler(crawler)
+        spider.fanout = int(spider.fanout if spider.fanout is not None else crawler.settings.getint('PAGINATION_FANOUT', 0))
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        return spider
+
+    async def spider_closed(self, spider, reason):
+        # Only a complete crawl moves the high-water mark, an interrupted one would hide the pages it never reached
+        if self.crawl_state and reason == 'finished' and self.force is not True:
+            self.crawl_state.save()
+        if self.profiler:
+            self.profiler.report()
+        if self.image_pool:
+            self.image_pool.close()
+        if self.image_cache:
+            self.image_cache.close()
+        if getattr(self, 'ocr_service', None):
+            self.ocr_service.close()
+        Http.close()
+        await Http.aclose()
+
     @classmethod
     def update_settings(cls, settings):
         cls.custom_tpdb_settings.update(cls.custom_scraper_settings)
@@ -98,7 +144,7 @@ class BaseScraper(scrapy.Spider, ABC):
                 print("Using Proxy: False")
 
         for link in self.start_urls:
-            yield scrapy.Request(url=self.get_next_page_url(link, self.page), callback=self.parse, meta=meta, headers=self.headers, cookies=self.cookies)
+            yield scrapy.Request(url=self.get_next_page_url(link, self.page), callback=self.parse, meta={**meta, 'tpdb_start_url': link}, headers=self.headers, cookies=self.cookies)
 
     def get_selector_map(self, attr=None):
         if hasattr(self, 'selector_map'):
@@ -151,36 +197,123 @@ class BaseScraper(scrapy.Spider, ABC):
     def get_image_from_link(self, image):
         if image:
             req = Http.get(image, headers=self.headers, cookies=self.cookies)
-            if req and req.ok:
+            if req and req.is_success:
                 return req.content
         return None
 
-    def get_image_blob_from_link(self, image):
+    def image_blob_allowed(self):
         force_update = self.settings.get('force_update')
-        if force_update:
-            force_update = True
         force_fields = self.settings.get('force_fields')
         if force_fields:
             force_fields = force_fields.split(",")
 
-        if (not force_update or (force_update and "image" in force_fields)) and image:
+        return not force_update or bool(force_fields and "image" in force_fields)
+
+    def get_image_blob_from_link(self, image):
+        if self.image_blob_allowed() and image:
+            if self.image_cache:
+                blob = self.image_cache.fresh(image)
+                if blob:
+                    return blob
+
             data = self.get_image_from_link(image)
             if data:
-                try:
-                    img = BytesIO(data)
-                    img = Image.open(img)
-                    img = img.convert('RGB')
-                    width, height = img.size
-                    if height > 1080 or width > 1920:
-                        img.thumbnail((1920, 1080))
-                    buffer = BytesIO()
-                    img.save(buffer, format="JPEG")
-                    data = buffer.getvalue()
-                except Exception as ex:
-                    print(f"Could not decode image for evaluation: '{image}'.  Error: ", ex)
-                return base64.b64encode(data).decode('utf-8')
+                blob = self.image_cache.get(data) if self.image_cache else None
+                if not blob:
+                    blob = self.process_image_blob(data, image)
+                if self.image_cache:
+                    self.image_cache.store(image, data, blob)
+                return blob
         return None
 
+    def process_image_blob(self, data, image):
+        return transcode_image(data, image)
+
+    def fetch_image_blobs(self, item, blobs):
+        # blobs maps the blob field to the link field it is downloaded from, e.g. {'image_blob': 'image'}
+        if item is None:
+            return
+
+        pending = {blob: item[link] for blob, link in blobs.items() if item.get(link) and not item.get(blob)}
+        if pending and self.image_cache and self.image_blob_allowed():
+            for blob, link in list(pending.items()):
+                item[blob] = self.image_cache.fresh(link)
+                if item[blob]:
+                    del pending[blob]
+
+        if not pending or not self.image_blob_allowed():
+            yield item
+            return
+
+        if not self.settings.getbool('ASYNC_IMAGES', True):
+            for blob, link in pending.items():
+                item[blob] = self.get_image_blob_from_link(link)
+            yield item
+            return
+
+        # The item is held back until every blob request has either resolved or failed
+        state = {'item': item, 'pending': len(pending)}
+        for blob, link in pending.items():
+            meta = {'tpdb_image': state, 'tpdb_image_field': blob, 'tpdb_image_url': link}
+            if self.proxy_address and not self.settings.get('USE_PROXY'):
+                meta['proxy'] = self.proxy_address
+
+            headers = self.headers
+            if self.image_cache:
+                validators = self.image_cache.validators(link)
+                if validators:
+                    headers = {**self.headers, **validators}
+                    meta['handle_httpstatus_list'] = [304]
+
+            yield scrapy.Request(url=link, callback=self.parse_image_blob, errback=self.parse_image_blob_failed, meta=meta, headers=headers, cookies=self.cookies, priority=10, dont_filter=True)
+
+    async def parse_image_blob(self, response):
+        state = response.meta['tpdb_image']
+        link = response.meta['tpdb_image_url']
+
+        blob = None
+        # The item is released whatever happens here, at worst without this blob
+        try:
+            if self.image_cache:
+                if response.status == 304:
+                    blob = self.image_cache.revalidated(link)
+                else:
+                    blob = self.image_cache.get(response.body)
+
+            if response.status != 304:
+                if not blob:
+                    blob = await self.transcode_image_blob(response)
+
+                if self.image_cache:
+                    self.image_cache.store(link, response.body, blob, response.headers)
+        except Exception as ex:
+            logging.warning(f"Could not process image: '{link}'.  Error: {ex!r}")
+
+        state['item'][response.meta['tpdb_image_field']] = blob
+        for item in self.release_image_blob(state):
+            yield item
+
+    async def transcode_image_blob(self, response):
+        if self.image_pool:
+            try:
+                return await maybe_deferred_to_future(self.image_pool.transcode(response.body, response.url))
+            except Exception as ex:
+                # A worker killed by the OOM killer breaks the pool, and closing it cancels what is still queued
+                logging.warning(f"Image pool could not transcode '{response.url}', transcoding it inline.  Error: {ex!r}")
+
+        return self.process_image_blob(response.body, response.url)
+
+    def parse_image_blob_failed(self, failure):
+        request = failure.request
+        logging.warning(f"Could not download image: '{request.url}'.  Error: {failure.value!r}")
+        yield from self.release_image_blob(request.meta['tpdb_image'])
+
+    @staticmethod
+    def release_image_blob(state):
+        state['pending'] -= 1
+        if not state['pending']:
+            yield state['item']
+
     @staticmethod
     def duration_to_seconds(time_text):
         duration = ''
@@ -217,13 +350,13 @@ class BaseScraper(scrapy.Spider, ABC):
         return sceneid
 
     def get_site(self, response):
-        return tldextract.extract(response.url).domain
+        return get_domain(response.url)
 
     def get_network(self, response):
-        return tldextract.extract(response.url).domain
+        return get_domain(response.url)
 
     def get_parent(self, response):
-        return tldextract.extract(response.url).domain
+        return get_domain(response.url)
 
     def get_studio(self, response):
         if 'studio' in self.get_selector_map():
@@ -232,13 +365,7 @@ class BaseScraper(scrapy.Spider, ABC):
 
     @staticmethod
     def process_xpath(response, selector: str):
-        if selector.startswith('//') or selector.startswith('./'):
-            return response.xpath(selector)
-
-        if selector.startswith('/'):
-            return response.dpath(selector)
-
-        return response.css(selector)
+        return compile_selector(selector).select(response)
 
     def format_link(self, response, link):
         return self.format_url(response.url, link)
@@ -259,14 +386,121 @@ class BaseScraper(scrapy.Spider, ABC):
 
     @staticmethod
     def prepare_url(url: str) -> str:
-        if not url:
-            return ''
-
-        return furl(unquote(url)).url
+        return normalize_url(url)
 
     def get_next_page_url(self, base, page):
         return self.format_url(base, self.get_selector_map('pagination') % page)
 
+    def paginate(self, response, results):
+        # Yields the listing results, then the next listing page. Pagination for this start url stops once a page
+        # has dated results and none of them is newer than the days cutoff, or once it reaches results that were
+        # already seen by an earlier run (CRAWL_STATE_ENABLED)
+        filter_date = (date.today() - timedelta(self.days)).strftime('%Y-%m-%d') if self.days < 9999 else None
+        state = self.crawl_state if self.force is not True else None
+        start_url = response.meta.setdefault('tpdb_start_url', response.url)
+        first_page = response.meta.get('page', self.page) == self.page
+        count = dated = fresh = 0
+        seen = False
+        for result in results:
+            count += 1
+            if result is None:
+                # Already dropped by check_item
+                dated += 1
+            elif filter_date or state:
+                if isinstance(result, scrapy.Request):
+                    result_url, result_date = result.url, result.meta.get('date')
+                elif isinstance(result, (dict, scrapy.Item)):
+                    result_url, result_date = result.get('url'), result.get('date')
+                else:
+                    result_url = result_date = None
+
+                result_date = self.listing_date(result_date)
+                if result_date:
+                    dated += 1
+                    if filter_date and result_date > filter_date:
+                        fresh += 1
+
+                if state:
+                    external_id = self.get_from_regex(result_url, 'external_id') if result_url else None
+                    seen = seen or state.seen(start_url, external_id, result_date)
+                    state.record(start_url, external_id, result_date, first_page)
+            yield result
+
+        if 'page' not in response.meta:
+            return
+
+        if not count:
+            self.halt_fan_out(start_url, response.meta['page'])
+            return
+
+        if response.meta['page'] >= self.limit_pages:
+            return
+
+        if filter_date and dated and not fresh:
+            self.stop_pagination(response, 'pagination/days_stop', f'nothing newer than {filter_date}')
+            return
+
+        if seen:
+            self.stop_pagination(response, 'pagination/state_stop', 'reached results seen by the previous crawl')
+            return
+
+        if self.fanout and self.fanout > 1:
+            yield from self.fan_out(response, start_url, count)
+            return
+
+        meta = response.meta
+        meta['page'] = meta['page'] + 1
+        print('NEXT PAGE: ' + str(meta['page']))
+        yield scrapy.Request(url=self.get_next_page_url(response.url, meta['page']), callback=self.parse, meta=meta, headers=self.headers, cookies=self.cookies)
+
+    def fan_out(self, response, start_url, count):
+        # Keeps a window of listing pages requested ahead of the newest page parsed. The window doubles up to
+        # `fanout` while pages come back full and drops to a single page on a short one, the end is usually near
+        page = response.meta['page']
+        state = self.fanout_state.setdefault(start_url, {'window': 1, 'full': 0, 'scheduled': page, 'stop': None})
+        if count >= state['full']:
+            state['full'] = count
+            state['window'] = min(state['window'] * 2, self.fanout)
+        else:
+            state['window'] = 1
+
+        last = min(page + state['window'], self.limit_pages)
+        if state['stop'] is not None:
+            last = min(last, state['stop'])
+
+        for next_page in range(state['scheduled'] + 1, last + 1):
+            meta = dict(response.meta)
+            meta['page'] = next_page
+            print('NEXT PAGE: ' + str(next_page))
+            yield scrapy.Request(url=self.get_next_page_url(response.url, next_page), callback=self.parse, meta=meta, headers=self.headers, cookies=self.cookies)
+        state['scheduled'] = max(state['scheduled'], last)
+
+    def halt_fan_out(self, start_url, page):
+        # Listing pages past `page` that were requested ahead are dropped by TpdbRequestClassifierMiddleware
+        state = self.fanout_state.get(start_url)
+        if state and (state['stop'] is None or page < state['stop']):
+            state['stop'] = page
+
+    def fan_out_halted(self, request) -> bool:
+        state = self.fanout_state.get(request.meta.get('tpdb_start_url'))
+        return bool(state and state['stop'] is not None and request.meta.get('page', 0) > state['stop'])
+
+    def stop_pagination(self, response, reason, message):
+        self.halt_fan_out(response.meta.get('tpdb_start_url'), response.meta['page'])
+        self.crawler.stats.inc_value(reason)
+        if self.limit_pages != sys.maxsize:
+            self.crawler.stats.inc_value('pagination/pages_saved', self.limit_pages - response.meta['page'])
+        logging.info(f'Stopping pagination at page {response.meta["page"]} of {response.url}, {message}')
+
+    def classify_request(self, request):
+        # 'asset' for image downloads, 'detail' for pages matching external_id and 'listing' for the rest
+        if request.meta.get('tpdb_image'):
+            return 'asset'
+        if not self.regex.get('external_id'):
+            return 'detail'
+
+        return 'detail' if self.regex['external_id'][0].search(request.url) else 'listing'
+
     def get_from_regex(self, text, re_name):
         if re_name in self.regex and self.regex[re_name]:
             regexp, group, mod = self.get_regex(self.regex[re_name])
@@ -307,11 +541,24 @@ class BaseScraper(scrapy.Spider, ABC):
     def cleanup_date(self, item_date):
         return self.cleanup_text(item_date, self.date_trash)
 
+    def listing_date(self, result_date):
+        # Listing dates are compared as YYYY-MM-DD strings, spiders often pass the site's own format in meta
+        if not result_date:
+            return None
+
+        result_date = str(result_date)
+        if re.match(r'^\d{4}-\d{2}-\d{2}', result_date):
+            return result_date[:10]
+
+        parsed = self.parse_date(result_date)
+        return parsed.strftime('%Y-%m-%d') if parsed else None
+
     def parse_date(self, item_date, date_formats=None):
         item_date = self.cleanup_date(item_date)
-        settings = {'TIMEZONE': 'UTC'}
+        if self.date_parser is None:
+            self.date_parser = DateParser(self.date_languages)
 
-        return dateparser.parse(item_date, date_formats=date_formats, settings=settings)
+        return self.date_parser.parse(item_date, date_formats=date_formats)
 
     def check_item(self, item, days=None):
         if 'date' not in item:
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from tpdb.helpers.http import Http
+from tpdb.helpers.journal import SubmissionJournal
+from tpdb.helpers.submitter import ApiSubmitter
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Resubmit journaled API payloads that were never acknowledged'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--spider', dest='spider', default=None, help='only replay payloads journaled by this spider')
+        parser.add_argument('--limit', dest='limit', type=int, default=None, help='maximum number of payloads to replay')
+        parser.add_argument('--concurrency', dest='concurrency', type=int, default=None, help='parallel submissions (defaults to API_MAX_IN_FLIGHT)')
+        parser.add_argument('--purge', dest='purge', action='store_true', help='delete acknowledged entries afterwards')
+
+    def run(self, args, opts):
+        settings = self.settings
+        if not settings['TPDB_API_KEY']:
+            raise UsageError('TPDB_API_KEY is required to replay submissions')
+
+        journal = SubmissionJournal.from_settings(settings)
+        if not journal:
+            raise UsageError('SUBMISSION_JOURNAL_ENABLED is not set')
+
+        Http.configure(settings)
+        headers = {
+            'Authorization': f'Bearer {settings["TPDB_API_KEY"]}',
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'User-Agent': 'tpdb-scraper/1.0.0'
+        }
+        timeout = settings.getfloat('API_TIMEOUT', 10)
+        entries = journal.pending(opts.spider, opts.limit)
+        print(f'Replaying {len(entries)} journaled submissions from {journal.path}')
+
+        def post(entry):
+            return entry[0], Http.post(entry[2], json=entry[3], headers=headers, timeout=timeout)
+
+        acked = 0
+        with ThreadPoolExecutor(opts.concurrency or settings.getint('API_MAX_IN_FLIGHT', 8)) as executor:
+            # Journal writes stay on this thread, sqlite connections are not shared between threads
+            for entry_id, response in executor.map(post, entries):
+                if ApiSubmitter.acknowledged(response):
+                    journal.ack(entry_id, response.status_code)
+                    acked += 1
+                else:
+                    journal.fail(entry_id, None if response is None else response.status_code)
+
+        if opts.purge:
+            journal.purge()
+        journal.close()
+        Http.close()
+
+        print(f'{acked} acknowledged, {len(entries) - acked} still pending')
+        if acked < len(entries):
+            self.exitcode = 1
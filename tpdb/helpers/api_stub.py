@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+# Local stand-in for the TPDB API, point TPDB_API_URL at it to measure submission throughput
+#
+#   python -m tpdb.helpers.api_stub --port 8010 --latency 0.2 --fail-rate 0.05
+#   scrapy crawl Vixen -s TPDB_API_URL=http://127.0.0.1:8010 -s TPDB_API_KEY=stub
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ApiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    fail_rate = 0.0
+    received = 0
+    started = None
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+
+        if random.random() < self.fail_rate:
+            self.__reply(503, {'message': 'stub failure'})
+            return
+
+        try:
+            items = json.loads(body)
+        except ValueError:
+            self.__reply(422, {'message': 'invalid json'})
+            return
+
+        with ApiStubHandler.lock:
+            if ApiStubHandler.started is None:
+                ApiStubHandler.started = time.monotonic()
+            ApiStubHandler.received += len(items) if isinstance(items, list) else 1
+
+        self.__reply(200, {'data': {'path': self.path}})
+
+    def __reply(self, status: int, data: dict):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+    @classmethod
+    def rate(cls) -> float:
+        if cls.started is None:
+            return 0.0
+        return cls.received / max(time.monotonic() - cls.started, 0.001)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local TPDB API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each submission')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of submissions answered with a 503')
+    args = parser.parse_args()
+
+    ApiStubHandler.latency = args.latency
+    ApiStubHandler.fail_rate = args.fail_rate
+
+    server = ThreadingHTTPServer((args.host, args.port), ApiStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'API stub listening on http://{args.host}:{args.port}')
+
+    try:
+        while True:
+            time.sleep(5)
+            print(f'{ApiStubHandler.received} items received, {ApiStubHandler.rate():.1f} items/sec')
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
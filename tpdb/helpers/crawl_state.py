@@ -0,0 +1,67 @@
+import json
+import os
+import re
+from pathlib import Path
+
+from scrapy.utils.project import data_path
+
+
+class CrawlState:
+    # Newest date and first listing page ids seen per start url, kept between runs in one JSON file per spider.
+    # A listing page that reaches any of them is already known territory and pagination can stop there
+    iso_regex = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.previous = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self.current = {}
+        # A date stored before they were normalised would stop every later run wherever it happens to sort
+        for previous in self.previous.values():
+            previous['date'] = self.normalize_date(previous.get('date'))
+
+    @classmethod
+    def normalize_date(cls, result_date) -> str:
+        # Dates are compared as strings, anything not starting with YYYY-MM-DD is left out
+        if result_date and cls.iso_regex.match(str(result_date)):
+            return str(result_date)[:10]
+
+        return None
+
+    @classmethod
+    def from_crawler(cls, crawler, name: str):
+        settings = crawler.settings
+        if not settings.getbool('CRAWL_STATE_ENABLED'):
+            return None
+
+        path = data_path(settings.get('CRAWL_STATE_DIR', 'crawlstate'), createdir=True)
+        return cls(os.path.join(path, f'{name}.json'))
+
+    def seen(self, start_url: str, external_id: str = None, result_date: str = None) -> bool:
+        previous = self.previous.get(start_url)
+        if not previous:
+            return False
+
+        if external_id and external_id in previous['ids']:
+            return True
+
+        result_date = self.normalize_date(result_date)
+        return bool(result_date and previous['date'] and result_date < previous['date'])
+
+    def record(self, start_url: str, external_id: str = None, result_date: str = None, first_page: bool = False):
+        current = self.current.setdefault(start_url, {'date': None, 'ids': []})
+        if first_page and external_id and external_id not in current['ids']:
+            current['ids'].append(external_id)
+        result_date = self.normalize_date(result_date)
+        if result_date and (not current['date'] or result_date > current['date']):
+            current['date'] = result_date
+
+    def save(self):
+        state = dict(self.previous)
+        for start_url, current in self.current.items():
+            previous = self.previous.get(start_url, {})
+            newest = max(filter(None, [previous.get('date'), current['date']]), default=None)
+            state[start_url] = {'date': newest, 'ids': current['ids'] or previous.get('ids', [])}
+
+        temp = self.path.with_suffix('.tmp')
+        temp.write_text(json.dumps(state, indent=2))
+        os.replace(temp, self.path)
@@ -0,0 +1,68 @@
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+import dateparser
+
+from .stats import inc_stat
+
+
+class DateParser:
+    # Tries the spider's date_formats and plain ISO 8601 with the standard library before falling back to dateparser,
+    # and remembers the result for every raw string, listing and detail pages repeat the same dates over and over
+    iso_regex = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?$')
+    settings = {'TIMEZONE': 'UTC'}
+
+    def __init__(self, languages: list = None, cache_size: int = 10000, crawler=None):
+        self.languages = languages
+        self.cache_size = cache_size
+        self.crawler = crawler
+        self.cache = OrderedDict()
+
+    @classmethod
+    def from_crawler(cls, crawler, languages: list = None):
+        return cls(languages, crawler.settings.getint('DATE_CACHE_SIZE', 10000), crawler)
+
+    @staticmethod
+    def complete_format(date_format: str) -> bool:
+        # dateparser fills in a missing day, month or year from today and converts timezones, leave those formats to it
+        return ('%Y' in date_format or '%y' in date_format) and any(month in date_format for month in ('%m', '%b', '%B')) and '%d' in date_format and '%z' not in date_format and '%Z' not in date_format
+
+    def parse(self, text: str, date_formats: list = None):
+        key = (text, tuple(date_formats) if date_formats else None)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            inc_stat(self.crawler, 'dateparse/cache_hit')
+            return self.cache[key]
+
+        result = self.parse_fast(text, date_formats)
+        if result:
+            inc_stat(self.crawler, 'dateparse/fast')
+        else:
+            inc_stat(self.crawler, 'dateparse/dateparser')
+            result = dateparser.parse(text, date_formats=date_formats, languages=self.languages, settings=self.settings)
+
+        self.cache[key] = result
+        if self.cache_size and len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return result
+
+    def parse_fast(self, text: str, date_formats: list = None):
+        if not text:
+            return None
+
+        for date_format in date_formats or []:
+            if self.complete_format(date_format):
+                try:
+                    return datetime.strptime(text, date_format)
+                except ValueError:
+                    pass
+
+        if self.iso_regex.match(text):
+            try:
+                return datetime.fromisoformat(text)
+            except ValueError:
+                pass
+
+        return None
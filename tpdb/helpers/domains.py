@@ -0,0 +1,23 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import tldextract
+
+# Only the public suffix snapshot bundled with tldextract, the default extractor downloads the list on first use
+# and hangs workers without network access. Nothing is written to disk either
+extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+@lru_cache(maxsize=4096)
+def extract_host(host: str):
+    return extractor(host)
+
+
+def extract(url: str):
+    # Memoized per host, every item of a site shares the same few hosts
+    host = urlsplit(url).netloc
+    return extract_host(host) if host else extractor(url)
+
+
+def get_domain(url: str) -> str:
+    return extract(url).domain
@@ -0,0 +1,27 @@
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+from twisted.internet import defer
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    # Forking the threaded reactor process can copy a held lock into the child, workers start from a clean server process instead
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('forkserver'))
+
+
+def submit(executor: Executor, fn, *args, **kwargs) -> defer.Deferred:
+    # Runs fn in the executor, the Deferred fires on the reactor thread with its result or error
+    from twisted.internet import reactor
+
+    d = defer.Deferred()
+    future = executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(lambda f: reactor.callFromThread(_resolve, d, f))
+
+    return d
+
+
+def _resolve(d: defer.Deferred, future: Future):
+    try:
+        d.callback(future.result())
+    except Exception as ex:
+        d.errback(ex)
@@ -9,11 +9,11 @@ class FlareSolverr:
     def __init__(self, base_url: str):
         self.__BASE_URL = base_url
         self.__API_URL = f'{self.__BASE_URL}/v1'
-        self.__session = self.__set_session()
 
-    def __del__(self):
+    def close(self):
         if self.__session:
-            Http.post(self.__API_URL, json={'cmd': 'sessions.destroy', 'session': self.__session})
+            self.destroy_session(self.__session)
+            self.__session = None
 
     def __set_session(self) -> str:
         sessions = self.__get_sessions()
@@ -24,29 +24,43 @@ class FlareSolverr:
 
         return session
 
+    def create_session(self) -> str:
+        return self.__create_session()
+
+    def list_sessions(self, timeout: float = None) -> list:
+        return self.__get_sessions(timeout)
+
+    def destroy_session(self, session: str, timeout: float = None) -> bool:
+        req = Http.post(self.__API_URL, json={'cmd': 'sessions.destroy', 'session': session}, **self.__timeout(timeout))
+        return bool(req and req.is_success)
+
     def __create_session(self) -> str:
         req = Http.post(self.__API_URL, json={'cmd': 'sessions.create'})
 
         session = None
-        if req and req.ok:
+        if req and req.is_success:
             session = req.json()['session']
 
         return session
 
-    def __get_sessions(self) -> list:
-        req = Http.post(self.__API_URL, json={'cmd': 'sessions.list'})
+    def __get_sessions(self, timeout: float = None) -> list:
+        req = Http.post(self.__API_URL, json={'cmd': 'sessions.list'}, **self.__timeout(timeout))
         sessions = None
-        if req and req.ok:
+        if req and req.is_success:
             sessions = req.json()['sessions']
 
         return sessions
 
+    @staticmethod
+    def __timeout(timeout: float = None) -> dict:
+        return {} if timeout is None else {'timeout': timeout}
+
     def __request(self, url: str, method: str, **kwargs):
         cookies = kwargs.pop('cookies', {})
         data = kwargs.pop('data', {})
         method = method.lower()
 
-        if not self.__session:
+        if not self.get_session():
             return
 
         if method not in ['get', 'post']:
@@ -68,7 +82,7 @@ class FlareSolverr:
             params['cookies'] = cookies
 
         req = Http.post(self.__API_URL, json=params)
-        if req and req.ok:
+        if req and req.is_success:
             resp = req.json()['solution']
             headers = resp['headers']
             cookies = {cookie['name']: cookie['value'] for cookie in resp['cookies']}
@@ -87,4 +101,8 @@ class FlareSolverr:
         return self.__API_URL
 
     def get_session(self):
+        # Only looked up or created when first needed, FlareMiddleware uses its own sessions and never blocks on this
+        if not self.__session:
+            self.__session = self.__set_session()
+
         return self.__session
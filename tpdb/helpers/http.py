@@ -1,16 +1,110 @@
 import logging
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 
 import httpx
 from httpx import Response, Cookies
-from requests.cookies import cookiejar_from_dict
+
+
+class NoCookiePolicy(DefaultCookiePolicy):
+    # The shared clients never keep cookies between calls, each call passes its own
+    def set_ok(self, cookie, request):
+        return False
 
 
 class Http:
+    __client = None
+    __async_client = None
+    __settings = {
+        'http2': True,
+        'max_connections': 100,
+        'max_keepalive_connections': 20,
+        'keepalive_expiry': 30,
+        'timeout': 5,
+    }
+
+    # Options httpx only accepts when building a client, calls using them get a one-off client
+    __client_options = ('proxy', 'proxies', 'mounts', 'transport', 'verify', 'cert', 'trust_env', 'http1', 'http2', 'limits')
+
+    @staticmethod
+    def configure(settings):
+        Http.__settings = {
+            'http2': settings.getbool('HTTP_CLIENT_HTTP2', True),
+            'max_connections': settings.getint('HTTP_CLIENT_MAX_CONNECTIONS', 100),
+            'max_keepalive_connections': settings.getint('HTTP_CLIENT_MAX_KEEPALIVE', 20),
+            'keepalive_expiry': settings.getfloat('HTTP_CLIENT_KEEPALIVE_EXPIRY', 30),
+            'timeout': settings.getfloat('HTTP_CLIENT_TIMEOUT', 5),
+        }
+
+    @staticmethod
+    def __client_kwargs() -> dict:
+        http2 = Http.__settings['http2']
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+
+        limits = httpx.Limits(max_connections=Http.__settings['max_connections'],
+                              max_keepalive_connections=Http.__settings['max_keepalive_connections'],
+                              keepalive_expiry=Http.__settings['keepalive_expiry'])
+
+        return {
+            'http2': http2,
+            'limits': limits,
+            'timeout': Http.__settings['timeout'],
+            'verify': False,
+            'cookies': CookieJar(policy=NoCookiePolicy()),
+        }
+
+    @staticmethod
+    def client() -> httpx.Client:
+        if Http.__client is None:
+            Http.__client = httpx.Client(**Http.__client_kwargs())
+
+        return Http.__client
+
+    @staticmethod
+    def async_client() -> httpx.AsyncClient:
+        # Bound to the running asyncio loop, only usable with the asyncio reactor
+        if Http.__async_client is None:
+            Http.__async_client = httpx.AsyncClient(**Http.__client_kwargs())
+
+        return Http.__async_client
+
+    @staticmethod
+    def close():
+        if Http.__client is not None:
+            Http.__client.close()
+            Http.__client = None
+
+    @staticmethod
+    async def aclose():
+        if Http.__async_client is not None:
+            await Http.__async_client.aclose()
+            Http.__async_client = None
+
+    @staticmethod
+    def __cookie_header(kwargs: dict) -> dict:
+        # httpx deprecates per-request cookies on a client, they go out as a Cookie header instead
+        cookies = kwargs.pop('cookies', None)
+        if cookies:
+            headers = httpx.Headers(kwargs.get('headers'))
+            cookie = '; '.join(f'{c.name}={c.value}' for c in Cookies(cookies).jar)
+            headers['Cookie'] = f'{headers["Cookie"]}; {cookie}' if headers.get('Cookie') else cookie
+            kwargs['headers'] = headers
+
+        return kwargs
+
     @staticmethod
     def request(method: str, url: str, **kwargs):
         req = None
         try:
-            req = httpx.request(method, url, verify=False, **kwargs)
+            if any(option in kwargs for option in Http.__client_options):
+                kwargs.setdefault('verify', False)
+                with httpx.Client(**{k: kwargs.pop(k) for k in Http.__client_options if k in kwargs}) as client:
+                    req = client.request(method, url, **Http.__cookie_header(kwargs))
+            else:
+                req = Http.client().request(method, url, **Http.__cookie_header(kwargs))
         except Exception as e:
             logging.error(e)
             pass
@@ -29,17 +123,37 @@ class Http:
     def head(url: str, **kwargs):
         return Http.request('HEAD', url, **kwargs)
 
+    @staticmethod
+    async def arequest(method: str, url: str, **kwargs):
+        req = None
+        try:
+            if any(option in kwargs for option in Http.__client_options):
+                kwargs.setdefault('verify', False)
+                async with httpx.AsyncClient(**{k: kwargs.pop(k) for k in Http.__client_options if k in kwargs}) as client:
+                    req = await client.request(method, url, **Http.__cookie_header(kwargs))
+            else:
+                req = await Http.async_client().request(method, url, **Http.__cookie_header(kwargs))
+        except Exception as e:
+            logging.error(e)
+            pass
+
+        return req
+
+    @staticmethod
+    async def aget(url: str, **kwargs):
+        return await Http.arequest('GET', url, **kwargs)
+
+    @staticmethod
+    async def apost(url: str, **kwargs):
+        return await Http.arequest('POST', url, **kwargs)
+
     @staticmethod
     def fake_response(url: str, status_code: int, content, headers: dict, cookies: dict) -> Response:
         content = content if isinstance(content, bytes) else content.encode('UTF-8')
         cookies = {} if cookies is None else cookies
         headers = {} if headers is None else headers
 
-        response = Response()
-        response.url = url
-        response.status_code = status_code
-        response._content = content
-        response.headers = headers
-        response.cookies = Cookies(cookiejar_from_dict(cookies))
+        response = Response(status_code, headers=headers, content=content, request=httpx.Request('GET', url))
+        response._cookies = Cookies(cookies)
 
         return response
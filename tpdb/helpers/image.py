@@ -0,0 +1,53 @@
+import base64
+from io import BytesIO
+
+from PIL import Image
+from twisted.internet import defer
+
+from .executors import process_pool, submit
+
+MAX_SIZE = (1920, 1080)
+
+
+def transcode_image(data: bytes, image: str = None) -> str:
+    try:
+        img = Image.open(BytesIO(data))
+        width, height = img.size
+        if height > MAX_SIZE[1] or width > MAX_SIZE[0]:
+            # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding instead of decoding the full frame
+            img.draft('RGB', MAX_SIZE)
+        img = img.convert('RGB')
+        width, height = img.size
+        if height > MAX_SIZE[1] or width > MAX_SIZE[0]:
+            img.thumbnail(MAX_SIZE)
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG")
+        data = buffer.getvalue()
+    except Exception as ex:
+        print(f"Could not decode image for evaluation: '{image}'.  Error: ", ex)
+    return base64.b64encode(data).decode('utf-8')
+
+
+class ImagePool:
+    def __init__(self, workers: int = 0, queue_size: int = 0):
+        self.executor = None
+        self.semaphore = None
+        if workers > 0:
+            self.executor = process_pool(workers)
+            # Bounds the images handed to the pool, the remaining callbacks wait (holding their response) until a slot frees up
+            self.semaphore = defer.DeferredSemaphore(queue_size if queue_size > 0 else workers * 2)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.getint('IMAGE_WORKERS', 0), settings.getint('IMAGE_QUEUE_SIZE', 0))
+
+    def transcode(self, data: bytes, image: str = None) -> defer.Deferred:
+        if not self.executor:
+            return defer.succeed(transcode_image(data, image))
+
+        return self.semaphore.run(submit, self.executor, transcode_image, data, image)
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from scrapy.utils.project import data_path
+
+from .stats import inc_stat
+
+
+class ImageCache:
+    def __init__(self, path: str, max_size: int = 0, expiration_secs: int = 0, crawler=None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.expiration_secs = expiration_secs
+        self.crawler = crawler
+
+        self.db = sqlite3.connect(self.path / 'index.sqlite', isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT, etag TEXT, last_modified TEXT, fetched REAL)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, size INTEGER, accessed REAL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed)')
+        self.size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('IMAGE_CACHE_ENABLED'):
+            return None
+
+        path = data_path(settings.get('IMAGE_CACHE_DIR', 'imagecache'), createdir=True)
+        return cls(path, settings.getint('IMAGE_CACHE_MAX_SIZE', 0), settings.getint('IMAGE_CACHE_EXPIRATION_SECS', 0), crawler)
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    def fresh(self, url: str):
+        # Blob for a url fetched within IMAGE_CACHE_EXPIRATION_SECS, returned without touching the network
+        row = self.db.execute('SELECT hash, fetched FROM urls WHERE url = ?', (url,)).fetchone()
+        if row and (not self.expiration_secs or time.time() - row[1] < self.expiration_secs):
+            blob = self.__read(row[0])
+            if blob:
+                inc_stat(self.crawler, 'image_cache/hit')
+                return blob
+        return None
+
+    def validators(self, url: str) -> dict:
+        # Conditional request headers for a stale url whose blob is still on disk
+        row = self.db.execute('SELECT u.etag, u.last_modified FROM urls u JOIN blobs b ON b.hash = u.hash WHERE u.url = ?', (url,)).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers['If-None-Match'] = row[0]
+            if row[1]:
+                headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def revalidated(self, url: str):
+        # Called on a 304, the cached blob is still current
+        row = self.db.execute('SELECT hash FROM urls WHERE url = ?', (url,)).fetchone()
+        blob = self.__read(row[0]) if row else None
+        if blob:
+            self.db.execute('UPDATE urls SET fetched = ? WHERE url = ?', (time.time(), url))
+            inc_stat(self.crawler, 'image_cache/revalidated')
+        return blob
+
+    def get(self, data: bytes):
+        # Blob for freshly downloaded bytes already normalized under another url
+        blob = self.__read(self.content_hash(data))
+        if blob:
+            inc_stat(self.crawler, 'image_cache/content_hit')
+        else:
+            inc_stat(self.crawler, 'image_cache/miss')
+        return blob
+
+    def store(self, url: str, data: bytes, blob: str, headers=None):
+        content_hash = self.content_hash(data)
+        blob_path = self.__blob_path(content_hash)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(exist_ok=True)
+            raw = base64.b64decode(blob)
+            blob_path.write_bytes(raw)
+            self.db.execute('INSERT OR REPLACE INTO blobs (hash, size, accessed) VALUES (?, ?, ?)', (content_hash, len(raw), time.time()))
+            self.size += len(raw)
+
+        etag, last_modified = None, None
+        if headers:
+            etag = headers.get('ETag')
+            last_modified = headers.get('Last-Modified')
+            etag = etag.decode() if isinstance(etag, bytes) else etag
+            last_modified = last_modified.decode() if isinstance(last_modified, bytes) else last_modified
+        self.__link(url, content_hash, etag, last_modified)
+        self.__evict()
+
+    def close(self):
+        self.db.close()
+
+    def __link(self, url: str, content_hash: str, etag: str = None, last_modified: str = None):
+        self.db.execute('INSERT OR REPLACE INTO urls (url, hash, etag, last_modified, fetched) VALUES (?, ?, ?, ?, ?)', (url, content_hash, etag, last_modified, time.time()))
+
+    def __read(self, content_hash: str):
+        blob_path = self.__blob_path(content_hash)
+        if not blob_path.exists():
+            return None
+
+        self.db.execute('UPDATE blobs SET accessed = ? WHERE hash = ?', (time.time(), content_hash))
+        return base64.b64encode(blob_path.read_bytes()).decode('utf-8')
+
+    def __evict(self):
+        if not self.max_size or self.size <= self.max_size:
+            return
+
+        for content_hash, size in self.db.execute('SELECT hash, size FROM blobs ORDER BY accessed').fetchall():
+            self.__blob_path(content_hash).unlink(missing_ok=True)
+            self.db.execute('DELETE FROM blobs WHERE hash = ?', (content_hash,))
+            self.db.execute('DELETE FROM urls WHERE hash = ?', (content_hash,))
+            self.size -= size
+            inc_stat(self.crawler, 'image_cache/evicted')
+            if self.size <= self.max_size:
+                break
+
+    def __blob_path(self, content_hash: str) -> Path:
+        return self.path / content_hash[:2] / f'{content_hash}.jpg'
@@ -0,0 +1,55 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from scrapy.utils.project import data_path
+
+
+class SubmissionJournal:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY AUTOINCREMENT, spider TEXT, url TEXT, payload TEXT, created REAL, acked REAL, status INTEGER, attempts INTEGER DEFAULT 0)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_acked ON entries (acked, id)')
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.getbool('SUBMISSION_JOURNAL_ENABLED'):
+            return None
+
+        return cls(data_path(settings.get('SUBMISSION_JOURNAL', 'submissions.sqlite')))
+
+    def append(self, spider: str, url: str, payload: dict) -> int:
+        cursor = self.db.execute('INSERT INTO entries (spider, url, payload, created) VALUES (?, ?, ?, ?)', (spider, url, json.dumps(payload), time.time()))
+        return cursor.lastrowid
+
+    def ack(self, entry_id: int, status: int):
+        # The API accepted the payload (2xx), it is no longer needed
+        self.db.execute('UPDATE entries SET acked = ?, status = ?, payload = NULL, attempts = attempts + 1 WHERE id = ?', (time.time(), status, entry_id))
+
+    def fail(self, entry_id: int, status: int = None):
+        # Rejected payloads (e.g. a 401 with an expired API key) stay pending so they can be replayed
+        self.db.execute('UPDATE entries SET status = ?, attempts = attempts + 1 WHERE id = ?', (status, entry_id))
+
+    def pending(self, spider: str = None, limit: int = None) -> list:
+        query = 'SELECT id, spider, url, payload FROM entries WHERE acked IS NULL'
+        params = []
+        if spider:
+            query += ' AND spider = ?'
+            params.append(spider)
+        query += ' ORDER BY id'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        return [(entry_id, name, url, json.loads(payload)) for entry_id, name, url, payload in self.db.execute(query, params).fetchall()]
+
+    def purge(self):
+        self.db.execute('DELETE FROM entries WHERE acked IS NOT NULL')
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import math
+import re
+from urllib.parse import urlparse
+
+
+class KnownUrls:
+    # Bloom filter over the urls already stored in MongoDB for the spider's domains. A miss on a url of one of those
+    # domains means it was never scraped and saves the find_one round-trip, anything else still goes to MongoDB
+    def __init__(self, capacity: int, error_rate: float = 0.001, domains: list = None):
+        capacity = max(capacity, 1000)
+        self.size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+        self.count = 0
+        self.domains = tuple(domains or ())
+
+    def __positions(self, url: str):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, url: str):
+        for position in self.__positions(url):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, url: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(url))
+
+    def covers(self, url: str) -> bool:
+        # Only the bare and www hosts are loaded, other subdomains aren't reachable through an indexed prefix
+        host = urlparse(url).hostname or ''
+        return any(host == domain or host == 'www.' + domain for domain in self.domains)
+
+    def never_seen(self, url: str) -> bool:
+        # API and network spiders store urls on other hosts than their start urls, those were never loaded
+        return self.covers(url) and url not in self
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def get_domains(spider) -> list:
+        domains = set(getattr(spider, 'allowed_domains', None) or [])
+        for url in getattr(spider, 'start_urls', None) or []:
+            host = urlparse(url).hostname
+            if host:
+                domains.add(host)
+
+        return sorted({re.sub(r'^www\.', '', domain) for domain in domains})
+
+    @staticmethod
+    def get_prefixes(domains: list) -> list:
+        # Anchored literal prefixes are answered from the url index, an alternation or optional group scans the collection
+        return [f'^{scheme}://{www}{re.escape(domain)}' for domain in domains for scheme in ('https', 'http') for www in ('www\\.', '')]
+
+    @classmethod
+    def from_collection(cls, collection, domains: list):
+        query = {'$or': [{'url': {'$regex': prefix}} for prefix in cls.get_prefixes(domains)]}
+        urls = [document['url'] for document in collection.find(query, {'url': 1, '_id': 0}) if document.get('url')]
+        known = cls(len(urls), domains=domains)
+        for url in urls:
+            known.add(url)
+
+        return known
+
+    @classmethod
+    def for_spider(cls, spider, collection):
+        # Loaded once per spider and collection, shared by the downloader middleware and the pipeline
+        if not hasattr(spider, 'known_urls'):
+            spider.known_urls = {}
+
+        if collection.name not in spider.known_urls:
+            domains = cls.get_domains(spider)
+            spider.known_urls[collection.name] = cls.from_collection(collection, domains) if domains else None
+            if spider.known_urls[collection.name] is not None:
+                logging.info(f'Loaded {len(spider.known_urls[collection.name])} known {collection.name} urls for {", ".join(domains)}')
+
+        return spider.known_urls[collection.name]
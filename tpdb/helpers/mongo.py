@@ -0,0 +1,108 @@
+import logging
+
+from pymongo import MongoClient, ReplaceOne
+from scrapy import signals
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import defer, task, threads
+
+
+class MongoStore:
+    # Shared MongoDB access for the middlewares and pipelines of a crawler. Reads run in the reactor
+    # thread pool, upserts are buffered per collection and sent as unordered bulk_write batches.
+    # Lookups by url are answered from the writes not yet acknowledged, so a url stored earlier in the run is found
+    def __init__(self, url: str, database: str = 'scrapy', batch_size: int = 100, flush_interval: float = 5.0):
+        self.client = MongoClient(url)
+        self.db = self.client[database]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffers = {}
+        self.unacknowledged = {}
+        self.writes = set()
+        self.loop = None
+
+        for name in ('scenes', 'performers', 'errors'):
+            self.db[name].create_index('url')
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings['ENABLE_MONGODB']:
+            return None
+
+        # One store per crawler, whichever component asks first builds it
+        if getattr(crawler, 'mongo_store', None) is None:
+            s = crawler.settings
+            crawler.mongo_store = cls(s['MONGODB_URL'], s.get('MONGODB_DATABASE', 'scrapy'), s.getint('MONGODB_BATCH_SIZE', 100), s.getfloat('MONGODB_FLUSH_INTERVAL', 5.0))
+            crawler.signals.connect(crawler.mongo_store.open, signal=signals.spider_opened)
+            crawler.signals.connect(crawler.mongo_store.close, signal=signals.spider_closed)
+
+        return crawler.mongo_store
+
+    def open(self, spider):
+        if self.flush_interval > 0:
+            self.loop = task.LoopingCall(self.flush)
+            self.loop.start(self.flush_interval, now=False)
+
+    def find_one(self, collection: str, query: dict, projection: dict = None) -> defer.Deferred:
+        if list(query) == ['url']:
+            document = self.pending(collection, query['url'])
+            if document is not None:
+                return defer.succeed(self.project(document, projection))
+
+        return threads.deferToThread(self.db[collection].find_one, query, projection)
+
+    def pending(self, collection: str, url: str):
+        # Newest first, a buffered write replaces the one being flushed
+        batches = [self.buffers.get(collection, {})] + self.unacknowledged.get(collection, [])[::-1]
+        for batch in batches:
+            for query, document, upsert in batch.values():
+                if document.get('url') == url:
+                    return dict(document, _id=query.get('_id', document.get('_id')))
+
+        return None
+
+    @staticmethod
+    def project(document: dict, projection: dict = None) -> dict:
+        if not projection:
+            return document
+
+        fields = {name for name, included in projection.items() if included}
+        return {name: value for name, value in document.items() if name in fields or name == '_id'}
+
+    def replace_one(self, collection: str, query: dict, document: dict, upsert: bool = True):
+        # Later writes to the same document replace earlier ones still waiting in the buffer
+        buffer = self.buffers.setdefault(collection, {})
+        buffer[repr(sorted(query.items()))] = (query, document, upsert)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection)
+
+    def flush(self, collection: str = None) -> defer.Deferred:
+        writes = []
+        for name in [collection] if collection else list(self.buffers):
+            batch = self.buffers.pop(name, {})
+            if batch:
+                operations = [ReplaceOne(query, document, upsert=upsert) for query, document, upsert in batch.values()]
+                self.unacknowledged.setdefault(name, []).append(batch)
+                d = threads.deferToThread(self.db[name].bulk_write, operations, ordered=False)
+                d.addErrback(lambda failure, name=name: logging.error(f'MongoDB bulk write to {name} failed: {failure.value}'))
+                self.writes.add(d)
+                d.addBoth(self.__written, d)
+                d.addBoth(self.__acknowledged, name, batch)
+                writes.append(d)
+
+        return defer.DeferredList(writes)
+
+    async def close(self, spider):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+
+        self.flush()
+        await maybe_deferred_to_future(defer.DeferredList(list(self.writes)))
+        self.client.close()
+
+    def __written(self, result, d):
+        self.writes.discard(d)
+        return result
+
+    def __acknowledged(self, result, name: str, batch: dict):
+        self.unacknowledged[name] = [pending for pending in self.unacknowledged.get(name, []) if pending is not batch]
+        return result
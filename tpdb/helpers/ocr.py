@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import pytesseract
+from scrapy.utils.project import data_path
+from twisted.internet import defer, threads
+
+from .executors import process_pool, submit
+from .stats import inc_stat
+
+
+def read_images(ocr, images: list) -> list:
+    # Preprocessing and tesseract for a batch of images with a BaseOCR instance, returning the raw text of each
+    processed = [ocr._image_pre_processing(ocr._get_image_from_bytes(image)) for image in images]
+    if len(processed) == 1:
+        return [pytesseract.image_to_string(processed[0])]
+
+    # Several images go through a single tesseract run with a list file, pages come back separated by form feeds
+    with tempfile.TemporaryDirectory() as directory:
+        names = []
+        for position, image in enumerate(processed):
+            name = os.path.join(directory, f'{position}.png')
+            image.save(name)
+            names.append(name)
+
+        list_file = os.path.join(directory, 'images.txt')
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(names) + '\n')
+
+        pages = pytesseract.image_to_string(list_file).split('\f')
+
+    if len(pages) < len(processed):
+        logging.warning(f'Tesseract returned {len(pages)} pages for {len(processed)} images, reading them one by one')
+        return [pytesseract.image_to_string(image) for image in processed]
+
+    return pages[:len(processed)]
+
+
+def read_images_in_worker(ocr_class, images: list) -> list:
+    # Worker processes only get the class, the instance is made without __init__ as spiders are expensive to build.
+    # Preprocessing that needs state set up in __init__ has to run with OCR_WORKERS = 0
+    return read_images(ocr_class.__new__(ocr_class), images)
+
+
+class OCRCache:
+    # Raw tesseract output on disk, keyed by the image content and the OCR class since classes preprocess differently
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(ocr_class, image: bytes) -> str:
+        return f'{hashlib.sha1(image).hexdigest()}-{ocr_class.__module__}.{ocr_class.__qualname__}'
+
+    def get(self, key: str):
+        path = self.__path(key)
+        if not path.exists():
+            return None
+
+        return path.read_text(encoding='utf-8')
+
+    def store(self, key: str, text: str):
+        path = self.__path(key)
+        path.parent.mkdir(exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        temp.write_text(text, encoding='utf-8')
+        os.replace(temp, path)
+
+    def __path(self, key: str) -> Path:
+        return self.path / key[:2] / f'{key}.txt'
+
+
+class OCRService:
+    # Reads images for BaseOCR spiders in worker processes, or in threads with the spider itself when workers is 0.
+    # Images asked for within batch_window seconds of each other are read by one tesseract run, up to batch_size at a time,
+    # and the raw text is cached by image content
+    def __init__(self, workers: int = 0, batch_size: int = 8, batch_window: float = 0.05, cache: OCRCache = None, crawler=None):
+        self.executor = process_pool(workers) if workers > 0 else None
+        self.batch_size = max(batch_size, 1)
+        self.batch_window = batch_window
+        self.cache = cache
+        self.crawler = crawler
+        self.pending = {}
+        self.timers = {}
+        self.semaphore = defer.DeferredSemaphore(workers * 2 if workers > 0 else 2)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        cache = None
+        if s.getbool('OCR_CACHE_ENABLED'):
+            cache = OCRCache(data_path(s.get('OCR_CACHE_DIR', 'ocrcache'), createdir=True))
+
+        return cls(s.getint('OCR_WORKERS', 0), s.getint('OCR_BATCH_SIZE', 8), s.getfloat('OCR_BATCH_WINDOW', 0.05), cache, crawler)
+
+    def read(self, ocr, image: bytes) -> str:
+        # Blocking read for the synchronous BaseOCR.get_data_from_image, runs with the spider itself and only shares the cache
+        key = OCRCache.key(type(ocr), image) if self.cache else None
+        text = self.cache.get(key) if key else None
+        if text is not None:
+            inc_stat(self.crawler, 'ocr/cache_hit')
+            return text
+
+        text = read_images(ocr, [image])[0]
+        inc_stat(self.crawler, 'ocr/images')
+        if key:
+            self.cache.store(key, text)
+
+        return text
+
+    def read_async(self, ocr, image: bytes) -> defer.Deferred:
+        key = OCRCache.key(type(ocr), image) if self.cache else None
+        text = self.cache.get(key) if key else None
+        if text is not None:
+            inc_stat(self.crawler, 'ocr/cache_hit')
+            return defer.succeed(text)
+
+        d = defer.Deferred()
+        batch = self.pending.setdefault(ocr, [])
+        batch.append((image, key, d))
+        if len(batch) >= self.batch_size:
+            self.flush(ocr)
+        elif ocr not in self.timers:
+            from twisted.internet import reactor
+
+            self.timers[ocr] = reactor.callLater(self.batch_window, self.flush, ocr)
+
+        return d
+
+    def flush(self, ocr):
+        timer = self.timers.pop(ocr, None)
+        if timer and timer.active():
+            timer.cancel()
+
+        batch = self.pending.pop(ocr, [])
+        if batch:
+            inc_stat(self.crawler, 'ocr/batches')
+            self.semaphore.run(self.__submit, ocr, batch)
+
+    def __submit(self, ocr, batch: list) -> defer.Deferred:
+        images = [image for image, key, d in batch]
+        if self.executor:
+            d = submit(self.executor, read_images_in_worker, type(ocr), images)
+        else:
+            d = threads.deferToThread(read_images, ocr, images)
+
+        d.addCallbacks(self.__read, self.__failed, callbackArgs=(batch,), errbackArgs=(batch,))
+        return d
+
+    def __read(self, texts: list, batch: list):
+        for text, (image, key, d) in zip(texts, batch):
+            inc_stat(self.crawler, 'ocr/images')
+            if key:
+                self.cache.store(key, text)
+            d.callback(text)
+
+    def __failed(self, failure, batch: list):
+        logging.error(f'OCR of {len(batch)} images failed: {failure.value}')
+        for image, key, d in batch:
+            d.errback(failure)
+
+    def close(self):
+        for timer in self.timers.values():
+            if timer.active():
+                timer.cancel()
+        self.timers = {}
+
+        pending, self.pending = self.pending, {}
+        for batch in pending.values():
+            for image, key, d in batch:
+                d.errback(defer.CancelledError())
+
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,68 @@
+import inspect
+import logging
+import time
+from functools import wraps
+
+
+class FieldProfiler:
+    # Times every get_* field extractor of a spider plus parse_date, by wrapping them on the spider instance.
+    # Each field gets profile/<field>/calls, time_ms, max_ms and a latency histogram in the crawl stats,
+    # timings are inclusive so a field calling another one also carries its cost
+    infrastructure = ('get_selector_map', 'get_element', 'get_from_regex', 'get_regex', 'get_next_page_url',
+                      'get_scenes', 'get_movies', 'get_image_from_link', 'get_image_blob_from_link')
+    buckets = (1, 10, 100, 1000)
+
+    def __init__(self, crawler, spider):
+        self.crawler = crawler
+        self.fields = {}
+
+        names = [name for name in dir(type(spider)) if name.startswith('get_') and name not in self.infrastructure]
+        for name in names + ['parse_date']:
+            if isinstance(inspect.getattr_static(spider, name, None), property):
+                continue
+            method = getattr(spider, name, None)
+            if callable(method):
+                setattr(spider, name, self.wrap(name[4:] if name.startswith('get_') else name, method))
+
+    @classmethod
+    def from_crawler(cls, crawler, spider):
+        if not (crawler.settings.getbool('PROFILE_FIELDS') or str(getattr(spider, 'profile', '')).lower() in ('1', 'true', 'yes')):
+            return None
+
+        return cls(crawler, spider)
+
+    def wrap(self, field, method):
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            # Listing methods like BasePerformerScraper.get_performers return generators, async ones coroutines, there's nothing to time
+            if not inspect.isgenerator(result) and not inspect.iscoroutine(result):
+                self.record(field, (time.perf_counter() - start) * 1000)
+            return result
+
+        return timed
+
+    def record(self, field: str, elapsed: float):
+        calls, total, slowest = self.fields.get(field, (0, 0.0, 0.0))
+        self.fields[field] = (calls + 1, total + elapsed, max(slowest, elapsed))
+
+        stats = self.crawler.stats
+        stats.inc_value(f'profile/{field}/calls')
+        stats.inc_value(f'profile/{field}/time_ms', elapsed)
+        stats.max_value(f'profile/{field}/max_ms', elapsed)
+        bucket = next((f'le_{limit}ms' for limit in self.buckets if elapsed <= limit), f'gt_{self.buckets[-1]}ms')
+        stats.inc_value(f'profile/{field}/{bucket}')
+
+    def report(self) -> str:
+        if not self.fields:
+            return ''
+
+        overall = sum(total for calls, total, slowest in self.fields.values()) or 1
+        lines = [f'{"field":<24}{"calls":>8}{"total":>12}{"avg":>10}{"max":>10}{"share":>8}']
+        for field, (calls, total, slowest) in sorted(self.fields.items(), key=lambda entry: entry[1][1], reverse=True):
+            lines.append(f'{field:<24}{calls:>8}{total:>10.1f}ms{total / calls:>8.2f}ms{slowest:>8.1f}ms{total / overall * 100:>7.1f}%')
+
+        report = '\n'.join(lines)
+        logging.info(f'Field extraction profile:\n{report}')
+        return report
@@ -1,4 +1,4 @@
-from .response import DPathResponse
+from .response import DPathMixin, DPathResponse
 from .middleware import DPathMiddleware
 
-__all__ = ['DPathResponse', 'DPathMiddleware']
+__all__ = ['DPathMixin', 'DPathResponse', 'DPathMiddleware']
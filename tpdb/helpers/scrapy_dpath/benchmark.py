@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+
+import dpath
+
+from tpdb.helpers.scrapy_dpath.dpath import compile_dpath
+
+# python -m tpdb.helpers.scrapy_dpath.benchmark --items 500 --rounds 20
+# Runs the selectors an API spider would use per listing against a synthetic payload, with dpath.values and
+# with the compiled selectors, and checks both return the same values
+SELECTORS = [
+    'data/0/title',
+    'data/*/id',
+    'data/*/title',
+    'data/*/attributes/date',
+    'data/*/performers/*/name',
+    'data/*/tags/*',
+    'data/*/media/images/*/url',
+    'meta/pagination/total',
+    '/data/-1/id',
+    'data/1?/title',
+    'data/**/name',
+]
+
+
+def build_payload(items: int, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    data = []
+    for i in range(items):
+        data.append({
+            'id': i,
+            'title': f'Scene {i}',
+            'description': ' '.join(rng.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet']) for _ in range(60)),
+            'attributes': {'date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', 'duration': rng.randint(60, 7200)},
+            'performers': [{'id': rng.randint(1, 10000), 'name': f'Performer {rng.randint(1, 10000)}', 'gender': 'Female'} for _ in range(rng.randint(1, 4))],
+            'tags': [f'Tag {rng.randint(1, 500)}' for _ in range(rng.randint(5, 25))],
+            'media': {'images': [{'url': f'https://cdn.example.com/{i}/{n}.jpg', 'width': 1920} for n in range(rng.randint(1, 6))]},
+        })
+
+    return {'data': data, 'meta': {'pagination': {'total': items, 'page': 1}}}
+
+
+def measure(function, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compiled dpath selectors with dpath.values')
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_payload(args.items)
+    print(f'{"selector":<32}{"dpath":>12}{"compiled":>12}{"speedup":>10}')
+    for selector in SELECTORS:
+        expected = dpath.values(payload, selector)
+        compiled = compile_dpath(selector).values(payload)
+        if compiled != expected:
+            raise AssertionError(f'{selector}: compiled selector returned {len(compiled)} values, dpath {len(expected)}')
+
+        reference = measure(lambda: dpath.values(payload, selector), args.rounds)
+        fast = measure(lambda: compile_dpath(selector).values(payload), args.rounds)
+        print(f'{selector:<32}{reference * 1000:>10.2f}ms{fast * 1000:>10.3f}ms{reference / fast:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
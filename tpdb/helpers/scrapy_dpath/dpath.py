@@ -1,4 +1,66 @@
-import dpath.util
+import re
+from fnmatch import fnmatchcase
+from functools import lru_cache
+
+import dpath
+
+
+class DPathSelector:
+    # A dpath glob split once into segments. Literal segments are plain key or index lookups, fnmatch only runs
+    # for segments with glob characters, and '**' globs are left to dpath itself
+    magic = re.compile(r'[*?[]')
+
+    def __init__(self, selector: str, separator: str = '/'):
+        self.selector = selector
+        self.separator = separator
+        segments = selector.lstrip(separator).split(separator)
+        self.fallback = '**' in segments
+        self.steps = [(segment, bool(self.magic.search(segment)), self.index(segment)) for segment in segments]
+
+    @staticmethod
+    def index(segment: str):
+        try:
+            return int(segment)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def match(key, segment: str) -> bool:
+        try:
+            return fnmatchcase(key, segment)
+        except TypeError:
+            return False
+
+    def values(self, obj) -> list:
+        # Same results, in the same order, as dpath.values(obj, selector) including intermediate dicts and lists
+        if self.fallback:
+            return dpath.values(obj, self.selector, separator=self.separator)
+
+        nodes = [obj]
+        for segment, glob, index in self.steps:
+            matched = []
+            for node in nodes:
+                if isinstance(node, dict):
+                    if glob:
+                        matched.extend(value for key, value in node.items() if self.match(key, segment))
+                    elif segment in node:
+                        matched.append(node[segment])
+                elif isinstance(node, (list, tuple)):
+                    if glob:
+                        matched.extend(value for position, value in enumerate(node) if fnmatchcase(str(position), segment))
+                    elif index is not None and -len(node) <= index < len(node):
+                        matched.append(node[index])
+
+            nodes = matched
+            if not nodes:
+                break
+
+        return nodes
+
+
+@lru_cache(maxsize=1024)
+def compile_dpath(selector: str, separator: str = '/') -> DPathSelector:
+    return DPathSelector(selector, separator)
 
 
 class ScrapyDPath:
@@ -7,24 +69,25 @@ class ScrapyDPath:
     def __init__(self, obj, selector, separator='/'):
         _dpath = None
         try:
-            _dpath = dpath.util.values(obj, selector, separator=separator)
+            _dpath = compile_dpath(selector, separator).values(obj)
         except:
             pass
 
+        # Kept as found, results are only turned into strings when asked for
         if _dpath:
-            self.__result = [str(res) for res in _dpath]
+            self.__result = _dpath
 
     def __repr__(self):
-        return repr(self.__result)
+        return repr(self.getall())
 
     def __len__(self):
         return len(self.__result) if self.__result else 0
 
     def __iter__(self):
-        yield self.__result
+        yield self.getall()
 
     def get(self):
-        return self.__result[0] if self.__result else None
+        return str(self.__result[0]) if self.__result else None
 
     def getall(self):
-        return self.__result if self.__result else None
+        return [str(res) for res in self.__result] if self.__result else None
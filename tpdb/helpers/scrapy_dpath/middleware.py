@@ -1,9 +1,18 @@
 from scrapy.http import TextResponse
 
-from tpdb.helpers.scrapy_dpath import DPathResponse
+from tpdb.helpers.scrapy_dpath.response import dpath_class
 
 
 class DPathMiddleware(object):
+    # JSON responses get the dpath() selector by switching their class in place, nothing is copied
+    # and HTML or binary responses pass through untouched
     def process_response(self, request, response, spider):
-        if isinstance(response, TextResponse):
-            return DPathResponse(request, response)
+        if isinstance(response, TextResponse) and self.is_json(response):
+            response.__class__ = dpath_class(type(response))
+        return response
+
+    @staticmethod
+    def is_json(response):
+        if b'json' in response.headers.get('Content-Type', b'').lower():
+            return True
+        return response.body[:64].lstrip()[:1] in (b'{', b'[')
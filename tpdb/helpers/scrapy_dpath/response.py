@@ -1,14 +1,28 @@
+from functools import lru_cache
+
 from scrapy.http import TextResponse
 
 from tpdb.helpers.scrapy_dpath.dpath import ScrapyDPath
 
 
-class DPathResponse(TextResponse):
-    request = None
-    response = None
+class DPathMixin:
+    __slots__ = ()
+
+    def dpath(self, selector):
+        # TextResponse.json() decodes the body once and keeps it on the response
+        return ScrapyDPath(self.json(), selector)
+
+
+@lru_cache(maxsize=None)
+def dpath_class(response_class):
+    # Same slots as the response class, so an existing response can be switched to it in place
+    return type(f'DPath{response_class.__name__}', (DPathMixin, response_class), {'__slots__': ()})
+
+
+class DPathResponse(DPathMixin, TextResponse):
+    __slots__ = ('response',)
 
     def __init__(self, request, response):
-        self.request = request
         self.response = response
 
         super(DPathResponse, self).__init__(response.url,
@@ -20,6 +34,3 @@ class DPathResponse(TextResponse):
                                             certificate=response.certificate,
                                             ip_address=response.ip_address,
                                             protocol=response.protocol)
-
-    def dpath(self, selector):
-        return ScrapyDPath(self.response.json(), selector)
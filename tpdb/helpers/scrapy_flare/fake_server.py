@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import json
+import logging
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tpdb.helpers.http import Http
+
+# python -m tpdb.helpers.scrapy_flare.fake_server --port 8191 --delay 2
+# Stands in for FlareSolverr when working on the middleware: sessions behave like browser tabs that render one page at a time,
+# pages are fetched directly and answered after --delay seconds with the same envelope FlareSolverr sends back.
+# The busiest any session got and the number of pages it served are logged when the server stops
+
+
+class FakeFlareSolverr(ThreadingHTTPServer):
+    daemon_threads = True
+    user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+    def __init__(self, address, delay: float = 0):
+        super().__init__(address, FakeFlareSolverrHandler)
+        self.delay = delay
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.served = 0
+        self.busiest = 0
+
+    def create_session(self, session: str = None) -> str:
+        session = session or str(uuid.uuid4())
+        with self.lock:
+            self.sessions.setdefault(session, {'tab': threading.Lock(), 'in_flight': 0})
+        return session
+
+    def solve(self, params: dict) -> dict:
+        session = self.sessions.get(params.get('session'))
+        if params.get('session') and session is None:
+            raise KeyError('This session does not exist.')
+
+        if session:
+            with self.lock:
+                session['in_flight'] += 1
+                self.busiest = max(self.busiest, session['in_flight'])
+
+        try:
+            # One tab renders one page at a time, like a FlareSolverr session does
+            with session['tab'] if session else contextlib.nullcontext():
+                time.sleep(self.delay)
+                cookies = {cookie['name']: cookie['value'] for cookie in params.get('cookies') or []}
+                headers = {'User-Agent': self.user_agent}
+                if params['cmd'] == 'request.post':
+                    req = Http.post(params['url'], content=params.get('postData', ''), headers=headers, cookies=cookies)
+                else:
+                    req = Http.get(params['url'], headers=headers, cookies=cookies, follow_redirects=True)
+        finally:
+            if session:
+                with self.lock:
+                    session['in_flight'] -= 1
+
+        if req is None:
+            raise ConnectionError(f'Could not fetch {params["url"]}')
+
+        with self.lock:
+            self.served += 1
+
+        return {
+            'url': str(req.url),
+            'status': req.status_code,
+            'headers': dict(req.headers),
+            'response': req.text,
+            'cookies': [{'name': name, 'value': value, 'domain': req.url.host, 'path': '/'} for name, value in req.cookies.items()],
+            'userAgent': self.user_agent,
+        }
+
+
+class FakeFlareSolverrHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/v1':
+            return self.reply(404, {'status': 'error', 'message': 'Not found'})
+
+        try:
+            params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError:
+            return self.reply(400, {'status': 'error', 'message': 'Request body is not JSON'})
+
+        server = self.server
+        cmd = params.get('cmd', '')
+        start = int(time.time() * 1000)
+        try:
+            if cmd == 'sessions.create':
+                result = {'session': server.create_session(params.get('session'))}
+            elif cmd == 'sessions.list':
+                result = {'sessions': list(server.sessions)}
+            elif cmd == 'sessions.destroy':
+                if server.sessions.pop(params.get('session'), None) is None:
+                    raise KeyError('The session doesn\'t exist.')
+                result = {}
+            elif cmd in ('request.get', 'request.post'):
+                result = {'solution': server.solve(params)}
+            else:
+                raise ValueError(f'Request parameter \'cmd\' = \'{cmd}\' is invalid.')
+        except (KeyError, ValueError, ConnectionError) as e:
+            return self.reply(500, {'status': 'error', 'message': f'Error: {e.args[0] if e.args else e}'})
+
+        self.reply(200, {'status': 'ok', 'message': '', 'startTimestamp': start, 'endTimestamp': int(time.time() * 1000), 'version': 'fake', **result})
+
+    def reply(self, status: int, envelope: dict):
+        body = json.dumps(envelope).encode('UTF-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a stand-in FlareSolverr server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8191)
+    parser.add_argument('--delay', type=float, default=0, help='Seconds every page takes to "render"')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeFlareSolverr((args.host, args.port), args.delay)
+    logging.info(f'Fake FlareSolverr listening on http://{args.host}:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f'Served {server.served} pages, the busiest session had {server.busiest} requests in flight')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,29 @@
+import json
+import logging
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from twisted.internet import threads
+
 from tpdb.helpers.flare_solverr import FlareSolverr
 from tpdb.helpers.scrapy_flare import FlareRequest, FlareResponse
+from tpdb.helpers.scrapy_flare.sessions import FlareSessionPool
+from tpdb.helpers.stats import inc_stat
 
 
 class FlareMiddleware(object):
-    def __init__(self, crawler, flare_solverr):
+    # With FLARE_REUSE_CLEARANCE only the first request to a host goes through FlareSolverr, the cookies and user agent
+    # of its solution are then sent with plain requests to that host until a challenge page shows up again
+    challenge_markers = (b'challenge-platform', b'cf-chl', b'cf_chl_opt', b'<title>Just a moment...</title>')
+
+    def __init__(self, crawler, flare_solverr, reuse_clearance=False):
         self.crawler = crawler
         self.flare_solverr = flare_solverr
+        self.pool = FlareSessionPool.from_crawler(crawler, flare_solverr)
+        self.reuse_clearance = reuse_clearance
+        self.clearances = {}
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -13,24 +31,127 @@ class FlareMiddleware(object):
         flare_url = s.get('FLARE_URL', '')
         flare_solverr = FlareSolverr(flare_url)
 
-        return cls(crawler, flare_solverr)
+        middleware = cls(crawler, flare_solverr, s.getbool('FLARE_REUSE_CLEARANCE'))
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+
+        return middleware
+
+    def spider_opened(self, spider):
+        # Not waited on, requests queue up in the pool until FlareSolverr answered
+        d = self.pool.start()
+        d.addCallback(self.__bootstrapped, spider)
+
+    def __bootstrapped(self, reachable, spider):
+        if reachable:
+            return
+
+        logging.error(f'{self.pool.error}, closing the spider')
+        engine = self.crawler.engine
+        if hasattr(engine, 'close_spider_async'):
+            deferred_from_coro(engine.close_spider_async(reason='flaresolverr_unavailable'))
+        else:
+            engine.close_spider(spider, 'flaresolverr_unavailable')
+
+    async def spider_closed(self, spider):
+        await self.pool.close()
+        await maybe_deferred_to_future(threads.deferToThread(self.flare_solverr.close))
 
-    def process_request(self, request, spider):
+    async def process_request(self, request, spider):
         if request.url == self.flare_solverr.get_api_url():
+            # Retries keep the session they were sent with, until their final response or error releases it
+            if getattr(request, 'params', None) and 'flare_session' not in request.meta:
+                session = await maybe_deferred_to_future(self.pool.acquire())
+                request.meta['flare_session'] = session
+                request.set_session(session)
             return
 
-        new_request = FlareRequest(request.url,
-                                   self.flare_solverr,
-                                   method=request.method,
-                                   meta=request.meta,
-                                   callback=request.callback,
-                                   priority=request.priority)
+        if request.meta.get('tpdb_kind') == 'asset':
+            return
+
+        clearance = self.clearances.get(urlparse(request.url).hostname) if self.reuse_clearance else None
+        if clearance:
+            self.add_cookies(request, clearance['cookies'])
+            if clearance['user_agent']:
+                request.headers['User-Agent'] = clearance['user_agent']
+            request.meta['flare_clearance'] = True
+            inc_stat(self.crawler, 'flare/clearance_reused')
+            return
 
-        return new_request
+        return self.solve(request)
 
     def process_response(self, request, response, spider):
         if request.url != self.flare_solverr.get_api_url():
-            return request
+            if request.meta.get('flare_clearance') and self.is_challenge(response):
+                # Clearance expired or was bound to something else, solve the page again and start over for the host
+                logging.info(f'Challenge page for {request.url} with a reused clearance, solving it again')
+                self.clearances.pop(urlparse(request.url).hostname, None)
+                inc_stat(self.crawler, 'flare/clearance_challenged')
+                return self.solve(request, dont_filter=True)
+
+            return response
+
+        session = request.meta.pop('flare_session', None)
+        if session:
+            self.pool.release(session, response.status == 200)
+
+        if response.status != 200 and session:
+            # Usually a session FlareSolverr lost, send the page again, the pool hands out a healthy session
+            attempts = request.meta.get('flare_attempts', 0) + 1
+            if attempts < self.pool.max_failures:
+                logging.warning(f'FlareSolverr session {session} failed with status {response.status}, solving the page again')
+                params = json.loads(request.body)
+                return FlareRequest(params['url'],
+                                    self.flare_solverr,
+                                    method=params['cmd'].split('.')[-1],
+                                    meta=dict(request.meta, flare_attempts=attempts),
+                                    callback=request.callback,
+                                    priority=request.priority,
+                                    dont_filter=True)
+            raise IgnoreRequest(f'FlareSolverr failed {attempts} times for {request}')
 
         new_response = FlareResponse(response)
+        inc_stat(self.crawler, 'flare/solved')
+        if self.reuse_clearance and new_response.cookies and not self.is_challenge(new_response):
+            self.clearances[urlparse(new_response.url).hostname] = {
+                'cookies': new_response.cookies,
+                'user_agent': new_response.user_agent,
+            }
+
         return new_response
+
+    def process_exception(self, request, exception, spider):
+        session = request.meta.pop('flare_session', None)
+        if session:
+            self.pool.release(session, False)
+
+    @staticmethod
+    def add_cookies(request, cookies: dict):
+        # Through request.cookies when the cookies middleware runs after this one, it rebuilds the Cookie header
+        # from its jar, and as the header itself when cookies are disabled
+        if isinstance(request.cookies, dict):
+            request.cookies = [{'name': name, 'value': value} for name, value in request.cookies.items()]
+        request.cookies = list(request.cookies or []) + [{'name': name, 'value': value, 'path': '/'} for name, value in cookies.items()]
+        request.headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+    def solve(self, request, **kwargs):
+        meta = dict(request.meta)
+        meta.pop('flare_clearance', None)
+        meta.pop('flare_session', None)
+
+        return FlareRequest(request.url,
+                            self.flare_solverr,
+                            method=request.method,
+                            meta=meta,
+                            callback=request.callback,
+                            priority=request.priority,
+                            **kwargs)
+
+    def is_challenge(self, response) -> bool:
+        if response.status not in (403, 503):
+            return False
+
+        if response.headers.get('cf-mitigated', b'').lower() == b'challenge':
+            return True
+
+        return any(marker in response.body[:65536] for marker in self.challenge_markers)
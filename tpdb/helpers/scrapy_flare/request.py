@@ -11,15 +11,19 @@ class FlareRequest(Request):
                  method='GET',
                  cookies=None,
                  meta=None,
+                 session=None,
                  **kwargs):
 
+        # Request.replace(), e.g. for retries, rebuilds the request from its final url and body
         if not flare_solverr:
+            self.params = None
+            super(FlareRequest, self).__init__(url=url, callback=callback, method=method, cookies=cookies, meta=meta, **kwargs)
             return
 
         method = method.lower()
         params = {
             'cmd': f'request.{method}',
-            'session': flare_solverr.get_session(),
+            'session': session,
             'url': url,
         }
 
@@ -29,6 +33,7 @@ class FlareRequest(Request):
                 cookies = [{'name': name, 'value': value, 'domain': domain} for name, value in cookies.items()]
             params['cookies'] = cookies
 
+        self.params = params
         super(FlareRequest, self).__init__(url=flare_solverr.get_api_url(),
                                            method='POST',
                                            callback=callback,
@@ -36,3 +41,8 @@ class FlareRequest(Request):
                                            body=json.dumps(params),
                                            headers={'Content-Type': 'application/json'},
                                            **kwargs)
+
+    def set_session(self, session: str):
+        # Sessions from the pool are only known once the request is about to be downloaded
+        self.params['session'] = session
+        self._set_body(json.dumps(self.params))
@@ -1,11 +1,22 @@
+import json
+
 from scrapy.http import HtmlResponse
 
 
 class FlareResponse(HtmlResponse):
+    # Headers describing the transfer of the original page, they don't apply to the body FlareSolverr hands back
+    dropped_headers = ('content-encoding', 'content-length', 'transfer-encoding')
+
     def __init__(self, response):
-        resp = response.json()['solution']
+        # Decoded straight from the bytes, response.json() would also keep the whole envelope around as text
+        resp = json.loads(response.body)['solution']
         url = resp['url']
         status = resp['status']
-        body = resp['response']
+        body = resp.pop('response').encode('UTF-8')
+        headers = {name: value for name, value in (resp.get('headers') or {}).items() if name.lower() not in self.dropped_headers}
+
+        # Kept for FLARE_REUSE_CLEARANCE, plain requests replay them to skip FlareSolverr
+        self.cookies = {cookie['name']: cookie['value'] for cookie in resp.get('cookies') or []}
+        self.user_agent = resp.get('userAgent')
 
-        super(FlareResponse, self).__init__(url, status=status, body=body, encoding='UTF-8', request=response.request)
+        super(FlareResponse, self).__init__(url, status=status, headers=headers, body=body, encoding='UTF-8', request=response.request)
@@ -0,0 +1,172 @@
+import logging
+from collections import deque
+
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import defer, threads
+from twisted.python.failure import Failure
+
+from tpdb.helpers.stats import inc_stat
+
+
+class FlareSession:
+    def __init__(self, session: str):
+        self.id = session
+        self.in_flight = 0
+        self.failures = 0
+
+
+class FlareSessionPool:
+    # Spreads FlareRequests over up to `size` FlareSolverr sessions, each one a browser tab that renders one page at a time.
+    # Sessions are created when all existing ones are at `max_in_flight`, requests past that wait for a free slot.
+    # A failed solve checks the session is still listed by FlareSolverr, sessions failing `max_failures` times in a row are replaced.
+    # Nothing is handed out before start() reached FlareSolverr, if it can't every waiting and later request fails right away
+    def __init__(self, flare_solverr, size: int = 1, max_in_flight: int = 1, max_failures: int = 3, timeout: float = 5, crawler=None):
+        self.flare_solverr = flare_solverr
+        self.size = max(size, 1)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_failures = max_failures
+        self.timeout = timeout
+        self.crawler = crawler
+        self.sessions = {}
+        self.creating = 0
+        self.waiters = deque()
+        self.checking = False
+        self.started = False
+        self.closed = False
+        self.error = 'FlareSolverr sessions are closed'
+
+    @classmethod
+    def from_crawler(cls, crawler, flare_solverr):
+        s = crawler.settings
+        return cls(flare_solverr, s.getint('FLARE_SESSIONS', 1), s.getint('FLARE_SESSION_MAX_IN_FLIGHT', 1), s.getint('FLARE_SESSION_MAX_FAILURES', 3),
+                   s.getfloat('FLARE_BOOTSTRAP_TIMEOUT', 5), crawler)
+
+    def start(self) -> defer.Deferred:
+        d = threads.deferToThread(self.flare_solverr.list_sessions, self.timeout)
+        d.addErrback(lambda failure: None)
+        d.addCallback(self.__started)
+        return d
+
+    def __started(self, listed) -> bool:
+        if listed is None:
+            self.fail(f'FlareSolverr at {self.flare_solverr.get_api_url()} is unreachable')
+            return False
+
+        self.started = True
+        self.dispatch()
+        return True
+
+    def fail(self, error: str):
+        self.error = error
+        self.closed = True
+        self.dispatch()
+
+    def acquire(self) -> defer.Deferred:
+        d = defer.Deferred()
+        self.waiters.append(d)
+        self.dispatch()
+        return d
+
+    def release(self, session: str, success: bool = True):
+        flare_session = self.sessions.get(session)
+        if flare_session:
+            flare_session.in_flight -= 1
+            if success:
+                flare_session.failures = 0
+            else:
+                flare_session.failures += 1
+                inc_stat(self.crawler, 'flare/session_failures')
+                if flare_session.failures >= self.max_failures:
+                    logging.warning(f'FlareSolverr session {session} failed {flare_session.failures} times in a row, replacing it')
+                    self.discard(session)
+                else:
+                    self.check()
+
+        self.dispatch()
+
+    def dispatch(self):
+        while self.waiters:
+            if self.closed:
+                self.waiters.popleft().errback(IgnoreRequest(self.error))
+                continue
+
+            if not self.started:
+                break
+
+            available = [flare_session for flare_session in self.sessions.values() if flare_session.in_flight < self.max_in_flight]
+            if available:
+                flare_session = min(available, key=lambda candidate: candidate.in_flight)
+                flare_session.in_flight += 1
+                self.waiters.popleft().callback(flare_session.id)
+                continue
+
+            # Every session is busy, open another one if the pool isn't full and wait for it or a release
+            if len(self.sessions) + self.creating < self.size and self.creating < len(self.waiters):
+                self.create()
+            break
+
+    def create(self):
+        self.creating += 1
+        d = threads.deferToThread(self.flare_solverr.create_session)
+        d.addBoth(self.__created)
+
+    def __created(self, session):
+        self.creating -= 1
+        if isinstance(session, str) and session:
+            if self.closed:
+                threads.deferToThread(self.flare_solverr.destroy_session, session, self.timeout)
+                return
+
+            self.sessions[session] = FlareSession(session)
+            inc_stat(self.crawler, 'flare/sessions_created')
+            logging.info(f'Created FlareSolverr session {session} ({len(self.sessions)}/{self.size})')
+        else:
+            error = session.value if isinstance(session, Failure) else 'no session returned'
+            logging.error(f'Could not create a FlareSolverr session: {error}')
+            # Nothing to hand out and nothing on the way, fail the waiting requests instead of leaving them hanging
+            if not self.sessions and not self.creating:
+                while self.waiters:
+                    self.waiters.popleft().errback(IgnoreRequest('No FlareSolverr session available'))
+
+        self.dispatch()
+
+    def check(self):
+        if self.checking:
+            return
+
+        self.checking = True
+        d = threads.deferToThread(self.flare_solverr.list_sessions)
+        d.addCallback(self.__checked)
+        d.addErrback(self.__check_failed)
+
+    def __checked(self, listed):
+        self.checking = False
+        if listed is None:
+            return
+
+        for session in list(self.sessions):
+            if session not in listed:
+                logging.warning(f'FlareSolverr session {session} is gone, replacing it')
+                self.sessions.pop(session)
+                inc_stat(self.crawler, 'flare/sessions_lost')
+
+        self.dispatch()
+
+    def __check_failed(self, failure):
+        self.checking = False
+        logging.error(f'FlareSolverr health check failed: {failure.value}')
+
+    def discard(self, session: str):
+        if self.sessions.pop(session, None):
+            threads.deferToThread(self.flare_solverr.destroy_session, session, self.timeout)
+
+    async def close(self, spider=None):
+        if not self.closed:
+            self.closed = True
+            self.dispatch()
+
+        sessions = list(self.sessions)
+        self.sessions = {}
+        destroyed = [threads.deferToThread(self.flare_solverr.destroy_session, session, self.timeout) for session in sessions]
+        await maybe_deferred_to_future(defer.DeferredList(destroyed, consumeErrors=True))
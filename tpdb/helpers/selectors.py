@@ -0,0 +1,85 @@
+import logging
+from functools import lru_cache
+
+from cssselect import SelectorError
+from lxml import etree
+from parsel import Selector, SelectorList
+from parsel.csstranslator import HTMLTranslator
+from scrapy.http import TextResponse, XmlResponse
+
+from tpdb.helpers.scrapy_dpath.dpath import compile_dpath
+
+translator = HTMLTranslator()
+
+
+class CompiledSelector:
+    # A selector_map entry resolved once: CSS is translated to XPath up front, XPath is compiled with lxml
+    # and dpath globs are compiled, so extraction only has to evaluate it. Matches are wrapped in plain
+    # parsel Selectors, building scrapy's Selector subclass for every node costs more than the query itself
+    def __init__(self, selector: str):
+        self.selector = selector
+        if selector.startswith('//') or selector.startswith('./'):
+            self.kind = 'xpath'
+            self.query = selector
+        elif selector.startswith('/'):
+            self.kind = 'dpath'
+            self.query = selector
+            compile_dpath(selector)
+        else:
+            self.kind = 'css'
+            try:
+                self.query = translator.css_to_xpath(selector)
+            except SelectorError as e:
+                raise ValueError(f'Invalid CSS selector {selector!r}: {e}')
+
+        self.xpath = None
+        if self.kind != 'dpath':
+            try:
+                self.xpath = etree.XPath(self.query, namespaces=Selector._default_namespaces, smart_strings=False)
+            except etree.XPathSyntaxError as e:
+                raise ValueError(f'Invalid XPath selector {selector!r}: {e}')
+
+    def select(self, response):
+        if self.kind == 'dpath':
+            return response.dpath(self.query)
+
+        # Also called with selectors from listing loops, only HTML roots are evaluated directly
+        if isinstance(response, Selector) and response.type == 'html' and hasattr(response.root, 'xpath'):
+            root = response.root
+        elif isinstance(response, TextResponse) and not isinstance(response, XmlResponse):
+            root = response.selector.root
+        else:
+            return response.css(self.selector) if self.kind == 'css' else response.xpath(self.query)
+
+        try:
+            result = self.xpath(root)
+        except etree.XPathError as e:
+            raise ValueError(f'XPath error: {e} in {self.query}')
+
+        if not isinstance(result, list):
+            result = [result]
+
+        return SelectorList([Selector(root=node, _expr=self.query, type='html') for node in result])
+
+
+@lru_cache(maxsize=1024)
+def compile_selector(selector: str) -> CompiledSelector:
+    return CompiledSelector(selector)
+
+
+def compile_selector_map(selector_map: dict, skip: tuple = ()) -> dict:
+    # Compiles every selector in a spider's selector_map so broken ones fail when the spider starts, not mid-crawl.
+    # XPath errors are fatal, anything that doesn't parse as CSS is only logged as some entries aren't selectors
+    compiled = {}
+    for name, selector in selector_map.items():
+        if name in skip or name.startswith('re_') or not selector or not isinstance(selector, str):
+            continue
+
+        try:
+            compiled[name] = compile_selector(selector)
+        except ValueError as e:
+            if selector.startswith('/') or selector.startswith('./'):
+                raise ValueError(f'selector_map[{name!r}]: {e}')
+            logging.warning(f'selector_map[{name!r}] is not a valid selector: {e}')
+
+    return compiled
@@ -0,0 +1,4 @@
+def inc_stat(crawler, key: str, count: int = 1):
+    # Stats are looked up lazily, helpers can be built with the spider before the crawler's stats collector exists
+    if crawler and crawler.stats:
+        crawler.stats.inc_value(key, count)
@@ -0,0 +1,84 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from twisted.internet import defer
+from twisted.internet.task import deferLater
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+
+from .executors import submit
+from .http import Http
+from .journal import SubmissionJournal
+
+
+class ApiSubmitter:
+    def __init__(self, max_in_flight: int = 8, retries: int = 3, backoff: float = 1.0, timeout: float = 10, journal: SubmissionJournal = None):
+        self.journal = journal
+        # Posts get their own threads, a slow API would otherwise hold the reactor pool that DNS, Mongo and FlareSolverr calls wait on
+        self.executor = ThreadPoolExecutor(max(max_in_flight, 1), thread_name_prefix='ApiSubmitter')
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        return cls(s.getint('API_MAX_IN_FLIGHT', 8), s.getint('API_RETRIES', 3), s.getfloat('API_RETRY_BACKOFF', 1.0), s.getfloat('API_TIMEOUT', 10), SubmissionJournal.from_settings(s))
+
+    def submit(self, url: str, payload: dict, headers: dict, spider: str = None) -> defer.Deferred:
+        # Fires with the final httpx response, or None if the API never answered
+        # Passing the spider name journals the payload first, so it can be replayed with `scrapy replay` if the API never acknowledges it
+        entry_id = self.journal.append(spider, url, payload) if self.journal and spider else None
+        d = deferred_from_coro(self.__submit(url, payload, headers, entry_id))
+        self.pending.add(d)
+        d.addBoth(self.__done, d)
+
+        return d
+
+    def flush(self) -> defer.Deferred:
+        d = defer.DeferredList(list(self.pending))
+        d.addBoth(lambda result: self.executor.shutdown(wait=False))
+        if self.journal:
+            d.addBoth(lambda result: self.journal.close())
+
+        return d
+
+    async def __submit(self, url: str, payload: dict, headers: dict, entry_id: int = None):
+        from twisted.internet import reactor
+
+        response = None
+        for attempt in range(self.retries + 1):
+            # The blocking post runs in the submitter's threads, at most max_in_flight at once
+            response = await maybe_deferred_to_future(self.post(url, payload, headers))
+            if self.final(response):
+                break
+
+            if attempt < self.retries:
+                delay = self.backoff * 2 ** attempt
+                logging.info(f'Retrying submission to {url} in {delay}s ({"no response" if response is None else response.status_code})')
+                await maybe_deferred_to_future(deferLater(reactor, delay, lambda: None))
+
+        if entry_id:
+            if self.acknowledged(response):
+                self.journal.ack(entry_id, response.status_code)
+            else:
+                self.journal.fail(entry_id, None if response is None else response.status_code)
+
+        return response
+
+    def post(self, url: str, payload: dict, headers: dict) -> defer.Deferred:
+        return submit(self.executor, Http.post, url, json=payload, headers=headers, timeout=self.timeout)
+
+    @staticmethod
+    def acknowledged(response) -> bool:
+        # Only a 2xx means the API took the payload, anything else keeps it in the journal for `scrapy replay`
+        return response is not None and 200 <= response.status_code < 300
+
+    @staticmethod
+    def final(response) -> bool:
+        # Retrying right away would not change a 4xx, except a timeout (408) or throttling (429)
+        return response is not None and response.status_code not in (408, 429) and response.status_code < 500
+
+    def __done(self, result, d):
+        self.pending.discard(d)
+        return result
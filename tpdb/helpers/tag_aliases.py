@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+import time
+
+from .stats import inc_stat
+
+
+class TagAliases:
+    # FILTER_TAG_FILENAME compiled into a dict keyed by the normalized alias, the first entry for an alias wins
+    # like it did with the linear scan. The file is reloaded when it changes, checked every reload_interval seconds
+    def __init__(self, path: str, reload_interval: float = 0, crawler=None):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.crawler = crawler
+        self.index = {}
+        self.mtime = None
+        self.checked = 0
+        self.load()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.get('FILTER_TAGS'):
+            return None
+
+        return cls(settings.get('FILTER_TAG_FILENAME'), settings.getfloat('FILTER_TAG_RELOAD_INTERVAL', 0), crawler)
+
+    @staticmethod
+    def normalize(tag: str) -> str:
+        return tag.lower().strip()
+
+    def load(self):
+        logging.info(f'Loading Tag Alias File: {self.path}')
+        self.mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as f:
+            aliases = json.load(f)
+
+        index = {}
+        for alias in aliases:
+            index.setdefault(self.normalize(alias['alias']), alias['tag'])
+        self.index = index
+
+    def check(self):
+        now = time.monotonic()
+        if now - self.checked < self.reload_interval:
+            return
+        self.checked = now
+
+        try:
+            if os.path.getmtime(self.path) != self.mtime:
+                self.load()
+        except (OSError, ValueError) as e:
+            # Keep the aliases we have until the file is readable again
+            logging.warning(f'Could not reload Tag Alias File {self.path}: {e}')
+
+    def clean(self, tags: list) -> list:
+        if self.reload_interval:
+            self.check()
+
+        cleaned = []
+        for tag in tags or []:
+            alias = self.index.get(self.normalize(tag))
+            if alias is None:
+                inc_stat(self.crawler, 'tags/unmatched')
+                alias = tag.rstrip('.').rstrip(',').strip()
+            cleaned.append(alias)
+
+        return list(dict.fromkeys(cleaned))
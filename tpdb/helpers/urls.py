@@ -0,0 +1,52 @@
+import re
+from collections import OrderedDict
+from urllib.parse import unquote
+
+from furl import furl
+
+
+class UrlNormalizer:
+    # furl(unquote(url)) with an LRU in front of it. Plain absolute urls that furl would hand back untouched skip it
+    # entirely, and every result is remembered as its own normalized form so the pipelines calling prepare_url again
+    # on an item's urls get them back as they are instead of decoding them a second time
+    segment = r'[A-Za-z0-9\-._~]*'
+    canonical = re.compile(
+        r'^https?://[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)*'
+        r'(?:/[A-Za-z0-9\-._~/]*)?'
+        rf'(?:\?(?=.){segment}(?:={segment})?(?:&{segment}(?:={segment})?)*)?$'
+    )
+
+    def __init__(self, cache_size: int = 10000):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def normalize(self, url: str) -> str:
+        if not url:
+            return ''
+
+        if url in self.cache:
+            self.cache.move_to_end(url)
+            return self.cache[url]
+
+        if self.canonical.match(url):
+            result = url
+        else:
+            result = furl(unquote(url)).url
+
+        self.remember(url, result)
+        if result not in self.cache:
+            self.remember(result, result)
+
+        return result
+
+    def remember(self, url: str, result: str):
+        self.cache[url] = result
+        if self.cache_size and len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+normalizer = UrlNormalizer()
+
+
+def normalize_url(url: str) -> str:
+    return normalizer.normalize(url)
@@ -2,17 +2,41 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-import re
-
-from pymongo import MongoClient
 from scrapy import signals
 from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import maybe_deferred_to_future
+
+from tpdb.helpers.known_urls import KnownUrls
+from tpdb.helpers.mongo import MongoStore
+
+
+def get_request_kind(request, spider):
+    # Set by TpdbRequestClassifierMiddleware, classified here when a spider replaced the middleware stack without it
+    if 'tpdb_kind' not in request.meta:
+        request.meta['tpdb_kind'] = spider.classify_request(request) if hasattr(spider, 'classify_request') else 'detail'
+
+    return request.meta['tpdb_kind']
+
+
+class TpdbRequestClassifierMiddleware:
+    # Runs first and tags every request as listing, detail or asset in request.meta['tpdb_kind'],
+    # using the regexes the spider compiled at init, so the middlewares after it don't match urls again.
+    # Always reclassified, callbacks often pass response.meta on to the requests they yield.
+    # Listing pages requested ahead by the pagination fan-out are dropped once an earlier page came back empty
+    def process_request(self, request, spider):
+        request.meta['tpdb_kind'] = spider.classify_request(request) if hasattr(spider, 'classify_request') else 'detail'
+        if request.meta['tpdb_kind'] == 'listing' and getattr(spider, 'fanout', None) and spider.fan_out_halted(request):
+            spider.crawler.stats.inc_value('pagination/fanout_ignored')
+            raise IgnoreRequest
+
+        return None
 
 
 class TpdbSceneDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
+    known_urls = None
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -21,15 +45,13 @@ class TpdbSceneDownloaderMiddleware:
 
         cls.crawler = crawler
 
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            cls.db = db['scrapy']
+        cls.store = MongoStore.from_crawler(crawler)
 
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
-    def process_request(self, request, spider):
-        if re.search(spider.get_selector_map('external_id'), request.url) is None:
+    async def process_request(self, request, spider):
+        if get_request_kind(request, spider) != 'detail':
             return None
 
         if spider.force is True:
@@ -37,7 +59,10 @@ class TpdbSceneDownloaderMiddleware:
 
         # Used in production - we store the scene in MongoDB for caching reasons
         if self.crawler.settings['ENABLE_MONGODB']:
-            result = self.db.scenes.find_one({'url': request.url})
+            if self.known_urls is not None and self.known_urls.never_seen(request.url):
+                return None
+
+            result = await maybe_deferred_to_future(self.store.find_one('scenes', {'url': request.url}, {'api_response': 1}))
             if result is not None and ('api_response' not in result or not result['api_response']):
                 raise IgnoreRequest
 
@@ -65,11 +90,15 @@ class TpdbSceneDownloaderMiddleware:
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
 
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.scenes)
+
 
 class TpdbMovieDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
+    known_urls = None
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -78,21 +107,24 @@ class TpdbMovieDownloaderMiddleware:
 
         cls.crawler = crawler
 
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            cls.db = db['scrapy']
+        cls.store = MongoStore.from_crawler(crawler)
 
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
-    def process_request(self, request, spider):
+    async def process_request(self, request, spider):
+        if get_request_kind(request, spider) != 'detail':
+            return None
 
         if spider.force is True:
             return None
 
         # Used in production - we store the scene in MongoDB for caching reasons
         if self.crawler.settings['ENABLE_MONGODB']:
-            result = self.db.scenes.find_one({'url': request.url})
+            if self.known_urls is not None and self.known_urls.never_seen(request.url):
+                return None
+
+            result = await maybe_deferred_to_future(self.store.find_one('scenes', {'url': request.url}, {'api_response': 1}))
             if result is not None and ('api_response' not in result or not result['api_response']):
                 raise IgnoreRequest
 
@@ -120,11 +152,16 @@ class TpdbMovieDownloaderMiddleware:
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
 
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.scenes)
+
 
 class TpdbPerformerDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
     # passed objects.
+    known_urls = None
+
     @classmethod
     def from_crawler(cls, crawler):
         # This method is used by Scrapy to create your spiders.
@@ -132,15 +169,13 @@ class TpdbPerformerDownloaderMiddleware:
 
         cls.crawler = crawler
 
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            cls.db = db['scrapy']
+        cls.store = MongoStore.from_crawler(crawler)
 
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
-    def process_request(self, request, spider):
-        if re.search(spider.get_selector_map('external_id'), request.url) is None:
+    async def process_request(self, request, spider):
+        if get_request_kind(request, spider) != 'detail':
             return None
 
         if spider.force is True:
@@ -148,7 +183,10 @@ class TpdbPerformerDownloaderMiddleware:
 
         # Used in production - we store the scene in MongoDB for caching reasons
         if self.crawler.settings['ENABLE_MONGODB']:
-            result = self.db.performers.find_one({'url': request.url})
+            if self.known_urls is not None and self.known_urls.never_seen(request.url):
+                return None
+
+            result = await maybe_deferred_to_future(self.store.find_one('performers', {'url': request.url}, {'api_response': 1}))
             if result is not None and ('api_response' not in result or not result['api_response']):
                 raise IgnoreRequest
 
@@ -175,3 +213,6 @@ class TpdbPerformerDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info('Spider opened: %s' % spider.name)
+
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.performers)
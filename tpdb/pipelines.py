@@ -6,18 +6,21 @@
 import hashlib
 import html
 import re
-import json
 import logging
 import time
 
 from pathlib import Path
 from datetime import datetime
 
-from pymongo import MongoClient
 from scrapy.exporters import JsonItemExporter, JsonLinesItemExporter
 
+from scrapy.utils.defer import maybe_deferred_to_future
+
 from tpdb.BaseScraper import BaseScraper
-from tpdb.helpers.http import Http
+from tpdb.helpers.known_urls import KnownUrls
+from tpdb.helpers.mongo import MongoStore
+from tpdb.helpers.submitter import ApiSubmitter
+from tpdb.helpers.tag_aliases import TagAliases
 
 
 class TpdbPipeline:
@@ -26,22 +29,21 @@ class TpdbPipeline:
 
 
 class TpdbApiScenePipeline:
+    known_urls = None
+
     def __init__(self, crawler):
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            self.db = db['scrapy']
+        self.store = MongoStore.from_crawler(crawler)
 
         self.crawler = crawler
+        self.submitter = ApiSubmitter.from_crawler(crawler)
+        self.api_url = crawler.settings.get('TPDB_API_URL', 'https://api.metadataapi.net')
 
         if crawler.settings.get('path'):
             path = crawler.settings.get('path')
         else:
             path = crawler.settings.get('DEFAULT_EXPORT_PATH')
 
-        if crawler.settings.get('FILTER_TAGS'):
-            logging.info(f"Loading Scene Tag Alias File: {crawler.settings.get('FILTER_TAG_FILENAME')}")
-            with open(crawler.settings.get('FILTER_TAG_FILENAME'), encoding='utf-8') as f:
-                self.tagaliases = json.load(f)
+        self.tagaliases = TagAliases.from_crawler(crawler)
 
         if crawler.settings.get('file'):
             filename = crawler.settings.get('file')
@@ -64,19 +66,23 @@ class TpdbApiScenePipeline:
     def from_crawler(cls, crawler):
         return cls(crawler)
 
+    def open_spider(self, spider):
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.scenes)
+
     async def process_item(self, item, spider):
         if spider.debug is True:
             return item
 
         # So we don't re-send scenes that have already been scraped
         if self.crawler.settings['ENABLE_MONGODB']:
-            if spider.force is not True:
-                result = self.db.scenes.find_one({'url': item['url']})
+            if spider.force is not True and (self.known_urls is None or not self.known_urls.never_seen(item['url'])):
+                result = await maybe_deferred_to_future(self.store.find_one('scenes', {'url': item['url']}, {'_id': 1}))
                 if result is not None:
                     return
 
         if self.crawler.settings['FILTER_TAGS']:
-            item['tags'] = self.clean_tags(item['tags'], self.tagaliases)
+            item['tags'] = self.tagaliases.clean(item['tags'])
 
         if item['date']:
             item['date'] = re.search(r'(\d{4}-\d{2}-\d{2})', item['date']).group(1)
@@ -145,9 +151,9 @@ class TpdbApiScenePipeline:
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
 
-            response = Http.post('https://api.metadataapi.net/scenes', json=payload, headers=headers, timeout=2)
+            response = await maybe_deferred_to_future(self.submitter.submit(f'{self.api_url}/scenes', payload, headers, spider.name))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = f'{disp_result} Submitted OK'
                 else:
                     disp_result = f'{disp_result} Submission Error: Code #{response.status_code}'
@@ -159,16 +165,17 @@ class TpdbApiScenePipeline:
             url_hash = hashlib.sha1(str(item['url']).encode('utf-8')).hexdigest()
 
             if self.crawler.settings['MONGODB_ENABLE']:
-                if not response.ok:
-                    self.db.errors.replace_one({'_id': url_hash}, {
+                if not response or not response.is_success:
+                    self.store.replace_one('errors', {'_id': url_hash}, {
                         'url': item['url'],
                         'error': 1,
                         'when': datetime.now().isoformat(),
-                        'response': response.json()
-                    }, upsert=True)
+                        'response': response.json() if response else None
+                    })
                 else:
-                    self.db.scenes.replace_one(
-                        {'_id': url_hash}, dict(item), upsert=True)
+                    self.store.replace_one('scenes', {'_id': url_hash}, dict(item))
+                    if self.known_urls is not None:
+                        self.known_urls.add(item['url'])
         else:
             disp_result = 'Local Run, Not Submitted'
 
@@ -180,9 +187,9 @@ class TpdbApiScenePipeline:
                 'Content-Type': 'application/json',
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
-            response = Http.post('http://api.tpdb.test/scenes', json=payload, headers=headers)
+            response = await maybe_deferred_to_future(self.submitter.submit('http://api.tpdb.test/scenes', payload, headers))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = disp_result + '\tSubmitted to Local OK'
                 else:
                     disp_result = f'{disp_result} \tSubmission to Local Error: Code #%d{response.status_code}'
@@ -223,45 +230,30 @@ class TpdbApiScenePipeline:
 
         return item
 
-    def clean_tags(self, tags, aliaslist):
-        tags2 = []
-        if tags:
-            for tag in tags:
-                pointer = 0
-                for alias in aliaslist:
-                    if not pointer and tag.lower().strip() == alias['alias'].lower().strip():
-                        tags2.append(alias['tag'])
-                        pointer = 1
-                        break
-                if not pointer:
-                    tags2.append(tag.rstrip(".").rstrip(",").strip())
-
-        tags2 = [i for n, i in enumerate(tags2) if i not in tags2[:n]]
-        return tags2
-
     def close_spider(self, spider):
         if spider.settings.getbool('export') or self.crawler.settings['EXPORT_ITEMS']:
             self.fp.write(']}'.encode())
             self.fp.close()
 
+        return self.submitter.flush()
+
 
 class TpdbApiMoviePipeline:
+    known_urls = None
+
     def __init__(self, crawler):
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            self.db = db['scrapy']
+        self.store = MongoStore.from_crawler(crawler)
 
         self.crawler = crawler
+        self.submitter = ApiSubmitter.from_crawler(crawler)
+        self.api_url = crawler.settings.get('TPDB_API_URL', 'https://api.metadataapi.net')
 
         if crawler.settings.get('path'):
             path = crawler.settings.get('path')
         else:
             path = crawler.settings.get('DEFAULT_EXPORT_PATH')
 
-        if crawler.settings.get('FILTER_TAGS'):
-            logging.info(f"Loading Movie Tag Alias File: {crawler.settings.get('FILTER_TAG_FILENAME')}")
-            with open(crawler.settings.get('FILTER_TAG_FILENAME'), encoding='utf-8') as f:
-                self.tagaliases = json.load(f)
+        self.tagaliases = TagAliases.from_crawler(crawler)
 
         if crawler.settings.get('file'):
             filename = crawler.settings.get('file')
@@ -284,19 +276,23 @@ class TpdbApiMoviePipeline:
     def from_crawler(cls, crawler):
         return cls(crawler)
 
+    def open_spider(self, spider):
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.scenes)
+
     async def process_item(self, item, spider):
         if spider.debug is True:
             return item
 
         # So we don't re-send scenes that have already been scraped
         if self.crawler.settings['ENABLE_MONGODB']:
-            if spider.force is not True:
-                result = self.db.scenes.find_one({'url': item['url']})
+            if spider.force is not True and (self.known_urls is None or not self.known_urls.never_seen(item['url'])):
+                result = await maybe_deferred_to_future(self.store.find_one('scenes', {'url': item['url']}, {'_id': 1}))
                 if result is not None:
                     return
 
         if self.crawler.settings['FILTER_TAGS']:
-            item['tags'] = self.clean_tags(item['tags'], self.tagaliases)
+            item['tags'] = self.tagaliases.clean(item['tags'])
 
         if 'length' in item and 'duration' not in item:
             item['duration'] = None
@@ -348,9 +344,9 @@ class TpdbApiMoviePipeline:
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
 
-            response = Http.post('https://api.metadataapi.net/movies', json=payload, headers=headers, timeout=2)
+            response = await maybe_deferred_to_future(self.submitter.submit(f'{self.api_url}/movies', payload, headers, spider.name))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = f'{disp_result} Submitted OK'
                 else:
                     disp_result = f'{disp_result} Submission Error: Code #{response.status_code}'
@@ -361,16 +357,17 @@ class TpdbApiMoviePipeline:
             url_hash = hashlib.sha1(str(item['url']).encode('utf-8')).hexdigest()
 
             if self.crawler.settings['MONGODB_ENABLE']:
-                if not response.ok:
-                    self.db.errors.replace_one({'_id': url_hash}, {
+                if not response or not response.is_success:
+                    self.store.replace_one('errors', {'_id': url_hash}, {
                         'url': item['url'],
                         'error': 1,
                         'when': datetime.now().isoformat(),
-                        'response': response.json()
-                    }, upsert=True)
+                        'response': response.json() if response else None
+                    })
                 else:
-                    self.db.scenes.replace_one(
-                        {'_id': url_hash}, dict(item), upsert=True)
+                    self.store.replace_one('scenes', {'_id': url_hash}, dict(item))
+                    if self.known_urls is not None:
+                        self.known_urls.add(item['url'])
         else:
             disp_result = 'Local Run, Not Submitted'
 
@@ -382,9 +379,9 @@ class TpdbApiMoviePipeline:
                 'Content-Type': 'application/json',
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
-            response = Http.post('http://api.tpdb.test/movies', json=payload, headers=headers)
+            response = await maybe_deferred_to_future(self.submitter.submit('http://api.tpdb.test/movies', payload, headers))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = disp_result + '\tSubmitted to Local OK'
                 else:
                     disp_result = disp_result + f'\tSubmission to Local Error: Code #{response.status_code}'
@@ -423,35 +420,23 @@ class TpdbApiMoviePipeline:
 
         return item
 
-    def clean_tags(self, tags, aliaslist):
-        tags2 = []
-        if tags:
-            for tag in tags:
-                pointer = 0
-                for alias in aliaslist:
-                    if not pointer and tag.lower().strip() == alias['alias'].lower().strip():
-                        tags2.append(alias['tag'])
-                        pointer = 1
-                        break
-                if not pointer:
-                    tags2.append(tag.rstrip(".").rstrip(",").strip())
-
-        tags2 = [i for n, i in enumerate(tags2) if i not in tags2[:n]]
-        return tags2
-
     def close_spider(self, spider):
         if spider.settings.getbool('export') or self.crawler.settings['EXPORT_ITEMS']:
             self.fp.write(']}'.encode())
             self.fp.close()
 
+        return self.submitter.flush()
+
 
 class TpdbApiPerformerPipeline:
+    known_urls = None
+
     def __init__(self, crawler):
-        if crawler.settings['ENABLE_MONGODB']:
-            db = MongoClient(crawler.settings['MONGODB_URL'])
-            self.db = db['scrapy']
+        self.store = MongoStore.from_crawler(crawler)
 
         self.crawler = crawler
+        self.submitter = ApiSubmitter.from_crawler(crawler)
+        self.api_url = crawler.settings.get('TPDB_API_URL', 'https://api.metadataapi.net')
 
         if crawler.settings.get('path'):
             path = crawler.settings.get('path')
@@ -479,10 +464,14 @@ class TpdbApiPerformerPipeline:
     def from_crawler(cls, crawler):
         return cls(crawler)
 
+    def open_spider(self, spider):
+        if self.crawler.settings['ENABLE_MONGODB'] and spider.force is not True:
+            self.known_urls = KnownUrls.for_spider(spider, self.store.db.performers)
+
     async def process_item(self, item, spider):
         if self.crawler.settings['ENABLE_MONGODB']:
-            if spider.force is not True:
-                result = self.db.performers.find_one({'url': item['url']})
+            if spider.force is not True and (self.known_urls is None or not self.known_urls.never_seen(item['url'])):
+                result = await maybe_deferred_to_future(self.store.find_one('performers', {'url': item['url']}, {'_id': 1}))
                 if result is not None:
                     return
 
@@ -531,9 +520,9 @@ class TpdbApiPerformerPipeline:
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
 
-            response = Http.post('https://api.metadataapi.net/performer_sites', json=payload, headers=headers, timeout=2)
+            response = await maybe_deferred_to_future(self.submitter.submit(f'{self.api_url}/performer_sites', payload, headers, spider.name))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = 'Submitted OK'
                 else:
                     disp_result = 'Submission Error: Code #' + str(response.status_code)
@@ -544,15 +533,17 @@ class TpdbApiPerformerPipeline:
 
             if self.crawler.settings['MONGODB_ENABLE']:
                 url_hash = hashlib.sha1(str(item['url']).encode('utf-8')).hexdigest()
-                if not response.ok:
-                    self.db.errors.replace_one({'_id': url_hash}, {
+                if not response or not response.is_success:
+                    self.store.replace_one('errors', {'_id': url_hash}, {
                         'url': item['url'],
                         'error': 1,
                         'when': datetime.now().isoformat(),
-                        'response': response.json()
-                    }, upsert=True)
+                        'response': response.json() if response else None
+                    })
                 else:
-                    self.db.performers.replace_one({'_id': url_hash}, dict(item), upsert=True)
+                    self.store.replace_one('performers', {'_id': url_hash}, dict(item))
+                    if self.known_urls is not None:
+                        self.known_urls.add(item['url'])
         else:
             disp_result = 'Local Run, Not Submitted'
 
@@ -565,9 +556,9 @@ class TpdbApiPerformerPipeline:
                 'User-Agent': 'tpdb-scraper/1.0.0'
             }
 
-            response = Http.post('http://api.tpdb.test/performer_sites', json=payload, headers=headers)
+            response = await maybe_deferred_to_future(self.submitter.submit('http://api.tpdb.test/performer_sites', payload, headers))
             if response:
-                if response.ok:
+                if response.is_success:
                     disp_result = disp_result + '\tSubmitted to Local OK'
                 else:
                     disp_result = disp_result + f'\tSubmission to Local Error: Code #{response.status_code}'
@@ -597,3 +588,5 @@ class TpdbApiPerformerPipeline:
         if spider.settings.getbool('export') or self.crawler.settings['EXPORT_ITEMS']:
             self.fp.write(']}'.encode())
             self.fp.close()
+
+        return self.submitter.flush()